@@ -0,0 +1,236 @@
+import cv2
+
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Tuple
+
+from .keyframeindex import KeyframeIndex
+from .recording import RecordingReader, RecordingWriter
+from .utils import logger_handler
+from .wledstreamer import WLEDStreamer
+
+# settings of a streamer that are needed to process frames for it
+PROCESS_SETTINGS = ["width", "height", "crop", "scale", "interpolation", "gamma"]
+
+
+def renderChunk(
+    source: str,
+    start_frame: int,
+    end_frame: int,
+    framerate: float,
+    stream_settings: List[Dict[str, Any]],
+    filename: str,
+) -> Tuple[int, int, float]:
+    """
+    Decodes the frames from start_frame up to end_frame of a video, and writes them to a
+    recording after processing them for each streamer. Runs in a worker process.
+
+    **Returns:** The process id of the worker, the number of frames, and the time it took
+    """
+    start_time = time.perf_counter()
+    # progress is reported by the main process
+    logging.getLogger("RecordingWriter").disabled = True
+
+    # base streamers only process frames, without connecting to WLED
+    streamers = [WLEDStreamer(**settings) for settings in stream_settings]
+    writer = RecordingWriter(
+        filename, [(streamer.width, streamer.height) for streamer in streamers]
+    )
+
+    capture = cv2.VideoCapture(source)
+    # chunks start at a keyframe, so this does not decode any frames before start_frame
+    capture.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    frame_number = start_frame
+    frame = None
+    while frame_number < end_frame:
+        grabbed, frame = capture.read(frame)
+        if not grabbed:
+            break
+        timestamp = frame_number / framerate
+        for index, streamer in enumerate(streamers):
+            stream_frame = streamer.cropFrame(frame)
+            stream_frame = streamer.scaleFrame(stream_frame)
+            stream_frame = streamer.gammaCorrectFrame(stream_frame)
+            writer.write(index, stream_frame, timestamp)
+        frame_number += 1
+
+    capture.release()
+    writer.close()
+
+    return os.getpid(), frame_number - start_frame, time.perf_counter() - start_time
+
+
+class ChunkedRenderer:
+    """
+    Processes a video file for each streamer as fast as possible, into a recording that can
+    be replayed. The video is split into chunks that start at a keyframe, which are decoded
+    and processed in parallel by a pool of processes, and then joined in order.
+    """
+
+    CHUNKS_PER_WORKER = 4
+
+    def __init__(
+        self,
+        source: str,
+        streamers: List[WLEDStreamer],
+        start: float = 0,
+        end: float = 0,
+        workers: int = 0,
+    ) -> None:
+        self.logger = logging.getLogger("ChunkedRenderer")
+        self.logger.propagate = False
+        self.logger.addHandler(logger_handler())
+        self.logger.setLevel(logging.DEBUG)
+
+        if not os.path.isfile(source):
+            raise ValueError("Only video files can be rendered, not %s" % source)
+
+        self._source = source
+        self._stream_settings = [
+            {key: getattr(streamer, key) for key in PROCESS_SETTINGS}
+            for streamer in streamers
+        ]
+        self._start = start
+        self._end = end
+        self._workers = workers or os.cpu_count() or 1
+
+    def render(self, filename: str) -> None:
+        capture = cv2.VideoCapture(self._source)
+        framerate = capture.get(cv2.CAP_PROP_FPS)
+        frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        capture.release()
+        if not framerate or frame_count <= 0:
+            raise ValueError("Could not get the length of %s" % self._source)
+
+        chunks = self._chunks(framerate, frame_count)
+        total_frames = sum(end_frame - start_frame for start_frame, end_frame in chunks)
+        self.logger.info(
+            "Rendering %d frames in %d chunks with %d workers"
+            % (total_frames, len(chunks), self._workers)
+        )
+
+        start_time = time.perf_counter()
+        temporary_directory = tempfile.mkdtemp(
+            prefix=".wledrender-", dir=os.path.dirname(os.path.abspath(filename))
+        )
+        try:
+            chunk_files = [
+                os.path.join(temporary_directory, "%06d.wledrec" % index)
+                for index in range(len(chunks))
+            ]
+            self._renderChunks(chunks, framerate, chunk_files, total_frames)
+            frame_count = self._join(chunk_files, filename)
+        finally:
+            shutil.rmtree(temporary_directory, ignore_errors=True)
+
+        elapsed_time = time.perf_counter() - start_time
+        self.logger.info(
+            "Rendered %d frames to %s in %.1fs (%.1f fps, %.1fx real time)"
+            % (
+                frame_count,
+                filename,
+                elapsed_time,
+                frame_count / elapsed_time,
+                frame_count / framerate / elapsed_time,
+            )
+        )
+
+    def _chunks(self, framerate: float, frame_count: int) -> List[Tuple[int, int]]:
+        start_frame = int(round(self._start * framerate))
+        end_frame = frame_count
+        if self._end:
+            end_frame = min(int(round(self._end * framerate)), frame_count)
+
+        count = self._workers * self.CHUNKS_PER_WORKER
+        keyframe_index = KeyframeIndex.load(self._source)
+        if keyframe_index is None:
+            self.logger.warning(
+                "No keyframe index; chunks may not start at a keyframe and seek slowly"
+            )
+            boundaries = [frame_count * index / count for index in range(count + 1)]
+        else:
+            boundaries = [
+                boundary * framerate
+                for boundary in keyframe_index.segments(frame_count / framerate, count)
+            ]
+
+        boundaries = sorted(
+            set(
+                [start_frame, end_frame]
+                + [
+                    int(round(boundary))
+                    for boundary in boundaries
+                    if start_frame < boundary < end_frame
+                ]
+            )
+        )
+        return list(zip(boundaries[:-1], boundaries[1:]))
+
+    def _renderChunks(
+        self,
+        chunks: List[Tuple[int, int]],
+        framerate: float,
+        chunk_files: List[str],
+        total_frames: int,
+    ) -> None:
+        worker_frames = {}  # type: Dict[int, int]
+        worker_times = {}  # type: Dict[int, float]
+        rendered_frames = 0
+        start_time = time.perf_counter()
+
+        with ProcessPoolExecutor(max_workers=self._workers) as executor:
+            futures = [
+                executor.submit(
+                    renderChunk,
+                    self._source,
+                    start_frame,
+                    end_frame,
+                    framerate,
+                    self._stream_settings,
+                    chunk_file,
+                )
+                for (start_frame, end_frame), chunk_file in zip(chunks, chunk_files)
+            ]
+            for future in as_completed(futures):
+                pid, frames, chunk_time = future.result()
+                worker_frames[pid] = worker_frames.get(pid, 0) + frames
+                worker_times[pid] = worker_times.get(pid, 0.0) + chunk_time
+                rendered_frames += frames
+
+                elapsed_time = time.perf_counter() - start_time
+                self.logger.info(
+                    "%.0f%% (%d/%d frames, %.1f fps)"
+                    % (
+                        rendered_frames / max(total_frames, 1) * 100,
+                        rendered_frames,
+                        total_frames,
+                        rendered_frames / elapsed_time,
+                    )
+                )
+
+        for pid in sorted(worker_frames):
+            self.logger.debug(
+                "worker %d: %d frames, %.1f fps"
+                % (pid, worker_frames[pid], worker_frames[pid] / max(worker_times[pid], 1e-6))
+            )
+
+    def _join(self, chunk_files: List[str], filename: str) -> int:
+        writer = RecordingWriter(
+            filename,
+            [(settings["width"], settings["height"]) for settings in self._stream_settings],
+        )
+        frame_count = 0
+        for chunk_file in chunk_files:
+            reader = RecordingReader(chunk_file)
+            for timestamp, device, frame in reader:
+                writer.write(device, frame, timestamp - self._start)
+                frame_count += 1
+            reader.close()
+        writer.close()
+
+        return frame_count // max(len(self._stream_settings), 1)
@@ -0,0 +1,266 @@
+import cv2
+import numpy as np
+
+import logging
+import os
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from .metrics import metrics
+from .pipeline import PLAYER_SETTINGS, createPlayer
+from .utils import logger_handler, cropArgument
+from .wledstreamer import WLEDStreamer
+
+
+class ScheduledSource:
+    """
+    Reads frames from a player on its own thread, and keeps the latest frame available
+    for any number of layers. Every source is decoded once, at its own rate.
+    """
+
+    def __init__(self, name: str, player, event: threading.Event) -> None:
+        self.name = name
+        self.player = player
+        self.version = 0
+        self.ended = False
+
+        self._event = event
+        self._lock = threading.Lock()
+        self._frame = None
+        self._stopped = False
+
+        self._thread = threading.Thread(target=self._run, name="Source %s" % name)
+        self._thread.daemon = True
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def acquire(self):
+        """Returns the latest frame, which has to be released after use"""
+        with self._lock:
+            frame = self._frame
+            if frame is not None and hasattr(self.player, "retain"):
+                self.player.retain(frame)
+            return frame
+
+    def release(self, frame) -> None:
+        if hasattr(self.player, "release"):
+            self.player.release(frame)
+
+    def stop(self) -> None:
+        self._stopped = True
+        self.player.stop()
+
+    def _run(self) -> None:
+        last_frame = None
+        while not self._stopped:
+            frame = self.player.read()
+            if frame is None or self._stopped:
+                break
+            if frame is last_frame:
+                # the player returned the same frame again (eg a camera)
+                time.sleep(0.001)
+                continue
+            last_frame = frame
+
+            with self._lock:
+                previous_frame = self._frame
+                self._frame = frame
+                self.version += 1
+            if previous_frame is not None:
+                self.release(previous_frame)
+            self._event.set()
+
+        self.ended = True
+        self._event.set()
+
+
+class Layer:
+    def __init__(
+        self,
+        source: ScheduledSource,
+        geometry: WLEDStreamer,
+        index: int,
+        rect: List[int],
+        alpha: float = 1.0,
+    ) -> None:
+        self.source = source
+        self.geometry = geometry
+        self.index = index  # index of the geometry in the streamers of a prepared source
+        self.rect = rect
+        self.alpha = alpha
+
+    def process(self, frame) -> np.ndarray:
+        if getattr(self.source.player, "prepared", False):
+            return frame[self.index]
+        frame = self.geometry.cropFrame(frame)
+        return self.geometry.scaleFrame(frame)
+
+
+class OutputGroup:
+    def __init__(self, streamer: WLEDStreamer, layers: List[Layer]) -> None:
+        self.streamer = streamer
+        self.layers = layers
+        self._versions = [-1] * len(layers)
+        self._canvas = np.zeros((streamer.height, streamer.width, 3), np.uint8)
+
+    def isDirty(self) -> bool:
+        return any(
+            layer.source.version != version
+            for layer, version in zip(self.layers, self._versions)
+        )
+
+    def compose(self) -> np.ndarray:
+        self._canvas[:] = 0
+        for index, layer in enumerate(self.layers):
+            self._versions[index] = layer.source.version
+            frame = layer.source.acquire()
+            if frame is None:
+                continue
+            try:
+                image = layer.process(frame)
+            finally:
+                layer.source.release(frame)
+
+            x, y, width, height = layer.rect
+            region = self._canvas[y : y + height, x : x + width]
+            image = image[: region.shape[0], : region.shape[1]]
+            if layer.alpha >= 1:
+                region[:] = image
+            elif layer.alpha > 0:
+                cv2.addWeighted(image, layer.alpha, region, 1 - layer.alpha, 0, dst=region)
+
+        return self.streamer.gammaCorrectFrame(self._canvas)
+
+
+class Compositor:
+    """
+    Plays several sources at once. Each [[wled]] group shows either one source, or a
+    composition of layers with alpha and picture-in-picture. Groups are only composed when
+    one of their sources has a new frame, on a pool of threads.
+    """
+
+    # frames returned by read() have already been processed for each streamer
+    prepared = True
+
+    def __init__(
+        self,
+        source_configs: List[Dict[str, Any]],
+        group_configs: List[Dict[str, Any]],
+        streamers: List[WLEDStreamer],
+        fps: float = 30,
+        workers: int = 0,
+    ) -> None:
+        self.logger = logging.getLogger("Compositor")
+        self.logger.propagate = False
+        self.logger.addHandler(logger_handler())
+        self.logger.setLevel(logging.DEBUG)
+
+        self._event = threading.Event()
+
+        source_names = [
+            source_config.get("name", str(index))
+            for index, source_config in enumerate(source_configs)
+        ]
+
+        # set up layers first, so prepared sources know what to prepare frames for
+        layer_configs = []
+        geometries = {name: [] for name in source_names}
+        for streamer, group_config in zip(streamers, group_configs):
+            if "layers" in group_config:
+                configs = group_config["layers"]
+            else:
+                configs = [{"source": group_config.get("source", source_names[0])}]
+
+            group_layers = []
+            for config in configs:
+                name = str(config.get("source", source_names[0]))
+                if name not in geometries:
+                    raise ValueError("Unknown source '%s'" % name)
+                # a layer covering the whole group uses the crop of the group
+                rect = config.get("rect", [0, 0, streamer.width, streamer.height])
+                crop = config.get("crop", streamer.crop if "rect" not in config else [])
+                # gamma is corrected once, after composing the layers
+                geometry = WLEDStreamer(
+                    width=rect[2],
+                    height=rect[3],
+                    crop=cropArgument(crop),
+                    scale=config.get("scale", streamer.scale),
+                    interpolation=config.get("interpolation", streamer.interpolation),
+                    gamma=1.0,
+                )
+                group_layers.append(
+                    (name, geometry, len(geometries[name]), rect, config.get("alpha", 1.0))
+                )
+                geometries[name].append(geometry)
+            layer_configs.append((streamer, group_layers))
+
+        self._sources = {}
+        for name, source_config in zip(source_names, source_configs):
+            if not geometries[name]:
+                self.logger.warning("Source '%s' is not used" % name)
+                continue
+            self.logger.info("Opening source '%s'" % name)
+            settings = {"fps": fps}
+            settings.update(
+                {
+                    key: value
+                    for key, value in source_config.items()
+                    if key in PLAYER_SETTINGS
+                }
+            )
+            player = createPlayer(streamers=geometries[name], **settings)
+            self._sources[name] = ScheduledSource(name, player, self._event)
+
+        self._groups = [
+            OutputGroup(
+                streamer,
+                [
+                    Layer(self._sources[name], geometry, index, rect, alpha)
+                    for name, geometry, index, rect, alpha in group_layers
+                ],
+            )
+            for streamer, group_layers in layer_configs
+        ]
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers or min(len(self._groups), os.cpu_count() or 1),
+            thread_name_prefix="Compositor",
+        )
+
+        for source in self._sources.values():
+            source.start()
+
+    def read(self) -> List[np.ndarray]:
+        while True:
+            self._event.wait()
+            self._event.clear()
+
+            dirty_groups = [group for group in self._groups if group.isDirty()]
+            if dirty_groups:
+                break
+            if all(source.ended for source in self._sources.values()):
+                return None
+
+        compose_start_time = time.perf_counter()
+        if len(dirty_groups) == 1:
+            frames = {id(dirty_groups[0]): dirty_groups[0].compose()}
+        else:
+            frames = dict(
+                zip(
+                    [id(group) for group in dirty_groups],
+                    self._executor.map(OutputGroup.compose, dirty_groups),
+                )
+            )
+
+        metrics.add("compose", time.perf_counter() - compose_start_time)
+
+        return [frames.get(id(group)) for group in self._groups]
+
+    def stop(self) -> None:
+        for source in self._sources.values():
+            source.stop()
+        self._executor.shutdown(wait=False)
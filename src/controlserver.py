@@ -0,0 +1,94 @@
+import json
+import logging
+import re
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .utils import logger_handler
+
+logger = logging.getLogger("ControlServer")
+logger.propagate = False
+logger.addHandler(logger_handler())
+logger.setLevel(logging.DEBUG)
+
+
+class ControlRequestHandler(BaseHTTPRequestHandler):
+    # (method, path pattern, command)
+    ROUTES = [
+        ("GET", r"/status", "status"),
+        ("POST", r"/play", "play"),
+        ("POST", r"/stop", "stop"),
+        ("POST", r"/reload", "reload"),
+        ("POST", r"/streamers/(?P<index>\d+)", "configure"),
+    ]
+
+    def do_GET(self) -> None:
+        self._handleRequest("GET")
+
+    def do_POST(self) -> None:
+        self._handleRequest("POST")
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(format % args)
+
+    def _handleRequest(self, method: str) -> None:
+        path = self.path.split("?")[0].rstrip("/")
+        for route_method, pattern, command in self.ROUTES:
+            match = re.fullmatch(pattern, path)
+            if match:
+                break
+        else:
+            self._sendJSON(404, {"error": "Unknown path %s" % path})
+            return
+        if route_method != method:
+            self._sendJSON(405, {"error": "Use %s for %s" % (route_method, path)})
+            return
+
+        params = {}
+        length = int(self.headers.get("Content-Length", 0))
+        if length:
+            try:
+                params = json.loads(self.rfile.read(length))
+            except ValueError:
+                self._sendJSON(400, {"error": "Request body is not valid JSON"})
+                return
+            if not isinstance(params, dict):
+                self._sendJSON(400, {"error": "Request body should be a JSON object"})
+                return
+        params.update({key: int(value) for key, value in match.groupdict().items()})
+
+        try:
+            result = self.server.wled_daemon.command(command, **params)
+        except Exception as e:
+            self._sendJSON(400, {"error": str(e)})
+            return
+        self._sendJSON(200, result)
+
+    def _sendJSON(self, status: int, data) -> None:
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ControlServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, wled_daemon, host: str = "127.0.0.1", port: int = 4049) -> None:
+        super().__init__((host, port), ControlRequestHandler)
+        self.wled_daemon = wled_daemon
+
+    def start(self) -> None:
+        thread = threading.Thread(target=self.serve_forever, name="ControlServer")
+        thread.daemon = True
+        thread.start()
+        logger.info(
+            "Listening for commands on http://%s:%d" % self.server_address[:2]
+        )
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
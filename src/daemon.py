@@ -0,0 +1,366 @@
+import toml
+
+import logging
+import queue
+import threading
+
+from concurrent.futures import Future
+from typing import Any, Dict, List
+
+from .controlserver import ControlServer
+from .pipeline import (
+    Pipeline,
+    STREAMER_SETTINGS,
+    connectionKey,
+    createPlayer,
+    createStreamer,
+    streamerConfig,
+    streamerSettings,
+)
+from .qualitycontroller import QualityController
+from .utils import logger_handler
+from .wledstreamer import WLEDStreamer
+
+
+class Daemon:
+    COMMAND_TIMEOUT = 120  # seconds; opening a stream with yt-dlp can take a while
+
+    # sections of the config file that the daemon can not play
+    UNSUPPORTED_SECTIONS = ["sources", "playlist"]
+
+    def __init__(
+        self,
+        pipeline: Pipeline,
+        stream_configs: List[Dict[str, Any]],
+        config_file: str = "config.toml",
+        config: Dict[str, Any] = {},
+        adaptive: bool = False,
+        control_host: str = "127.0.0.1",
+        control_port: int = 4049,
+        fps: float = 30,
+    ) -> None:
+        self.logger = logging.getLogger("Daemon")
+        self.logger.propagate = False
+        self.logger.addHandler(logger_handler())
+        self.logger.setLevel(logging.DEBUG)
+
+        self.pipeline = pipeline
+        self._stream_configs = stream_configs
+        self._config_file = config_file
+        self._adaptive = adaptive
+        self._fps = fps
+
+        self._commands = queue.Queue()
+
+        self._player = None
+        self._controller = None
+        self._source = None  # type: Dict[str, Any]
+        self._opening_source = None  # type: Dict[str, Any]
+
+        self._server = ControlServer(self, control_host, control_port)
+
+        self._checkConfig(config)
+
+    def command(self, name: str, **params) -> Dict[str, Any]:
+        """Queues a command for the streaming thread and waits for its result"""
+        future = Future()
+        self._commands.put((name, params, future))
+        return future.result(timeout=self.COMMAND_TIMEOUT)
+
+    def play(
+        self,
+        source: Any = None,
+        camera: bool = False,
+        display: bool = False,
+        loop: int = 0,
+        start: float = 0,
+        end: float = 0,
+    ) -> None:
+        self._commands.put(
+            (
+                "play",
+                {
+                    "source": source,
+                    "camera": camera,
+                    "display": display,
+                    "loop": loop,
+                    "start": start,
+                    "end": end,
+                },
+                Future(),
+            )
+        )
+
+    def run(self) -> None:
+        self._server.start()
+
+        while True:
+            try:
+                self._handleCommands(block=self._player is None)
+                if self._player is None:
+                    continue
+
+                if not self.pipeline.playFrame(self._player, self._controller):
+                    self.logger.info("Source ended")
+                    self._closePlayer()
+                    continue
+
+                if not self.pipeline.handleEvents():
+                    break
+
+            except (KeyboardInterrupt, SystemExit):
+                break
+            except Exception:
+                # keep the daemon running, but don't keep failing on the same source
+                self.logger.exception("Could not stream frame; stopping the source")
+                self._closePlayer()
+
+        self._server.stop()
+        self._closePlayer()
+
+    def _handleCommands(self, block: bool = False) -> None:
+        try:
+            command = self._commands.get(timeout=0.1) if block else self._commands.get_nowait()
+        except queue.Empty:
+            return
+
+        while True:
+            name, params, future = command
+            try:
+                result = getattr(self, "_command_" + name)(future=future, **params)
+                if result is not None:
+                    future.set_result(result)
+            except Exception as e:
+                self.logger.warning("Command '%s' failed: %s" % (name, e))
+                future.set_exception(e)
+
+            try:
+                command = self._commands.get_nowait()
+            except queue.Empty:
+                break
+
+    def _status(self) -> Dict[str, Any]:
+        streamers = []
+        for stream_config, streamer in zip(self._stream_configs, self.pipeline.streamers):
+            streamer_status = {
+                key: stream_config[key]
+                for key in ["host", "port", "serialport", "baudrate"]
+                if key in stream_config
+            }
+            streamer_status.update(
+                {
+                    "width": streamer.width,
+                    "height": streamer.height,
+                    "crop": streamer.crop,
+                    "scale": streamer.scale,
+                    "interpolation": streamer.interpolation,
+                    "gamma": streamer.gamma,
+                }
+            )
+            streamers.append(streamer_status)
+
+        status = {
+            "state": "playing" if self._player else "stopped",
+            "source": self._source,
+            "opening": self._opening_source,
+            "streamers": streamers,
+        }
+        if self.pipeline.sync:
+            status["sync_skew"] = self.pipeline.sync.skew
+        return status
+
+    def _command_status(self, future: Future) -> Dict[str, Any]:
+        return self._status()
+
+    def _command_play(
+        self,
+        future: Future,
+        source: Any = None,
+        camera: bool = False,
+        display: bool = False,
+        loop: int = 0,
+        start: float = 0,
+        end: float = 0,
+    ) -> None:
+        if source is None and not camera and not display:
+            if self._source is None:
+                raise ValueError("No source specified")
+            new_source = dict(self._source)
+        else:
+            new_source = {
+                "source": source if source is not None else 0,
+                "camera": camera,
+                "display": display,
+                "loop": loop,
+                "start": start,
+                "end": end,
+            }
+
+        # keep streaming the current source while the new source is opened
+        self._opening_source = new_source
+        thread = threading.Thread(
+            target=self._openPlayer, name="OpenSource", args=(new_source, future)
+        )
+        thread.daemon = True
+        thread.start()
+
+    def _openPlayer(self, source: Dict[str, Any], future: Future) -> None:
+        self.logger.info("Opening source %s" % source["source"])
+        try:
+            player = createPlayer(
+                fps=self._fps,
+                streamers=self.pipeline.streamers,
+                **source
+            )
+        except Exception as e:
+            self._commands.put(("failed", {"source": source, "error": e}, future))
+            return
+        self._commands.put(("opened", {"source": source, "player": player}, future))
+
+    def _command_opened(
+        self, future: Future, source: Dict[str, Any], player: Any
+    ) -> Dict[str, Any]:
+        if source is not self._opening_source:
+            # another source was requested in the meantime
+            player.stop()
+            raise RuntimeError("Playing source %s was cancelled" % source["source"])
+
+        self._closePlayer()
+        self._player = player
+        self._source = source
+        self._opening_source = None
+        self._resetController()
+
+        self.logger.info("Playing source %s" % source["source"])
+        return self._status()
+
+    def _command_failed(
+        self, future: Future, source: Dict[str, Any], error: Exception
+    ) -> None:
+        if source is self._opening_source:
+            self._opening_source = None
+        raise RuntimeError("Could not open source %s: %s" % (source["source"], error))
+
+    def _command_stop(self, future: Future) -> Dict[str, Any]:
+        self._opening_source = None
+        self._closePlayer()
+        return self._status()
+
+    def _command_configure(
+        self, future: Future, index: int, **settings
+    ) -> Dict[str, Any]:
+        if index >= len(self.pipeline.streamers):
+            raise ValueError("There is no WLED instance with index %d" % index)
+
+        # nothing is applied unless all settings are valid
+        settings = streamerSettings(settings)
+
+        # restore the quality first, so the new settings are not taken as lowered ones
+        self._closeController()
+        with self.pipeline.lock:
+            changed = self.pipeline.streamers[index].configure(**settings)
+        if changed:
+            self._stream_configs[index].update(settings)
+            self.logger.info("Changed settings of WLED instance %d" % index)
+            self._updatePlayer([index])
+        self._resetController()
+
+        return self._status()
+
+    def _command_reload(self, future: Future) -> Dict[str, Any]:
+        config = toml.load(self._config_file)
+        stream_configs = config.get("wled", [])
+        if isinstance(stream_configs, dict):
+            stream_configs = [stream_configs]
+        if not stream_configs:
+            raise ValueError("%s contains no [[wled]] groups" % self._config_file)
+        stream_configs = [streamerConfig(stream_config) for stream_config in stream_configs]
+        self._checkConfig(config)
+
+        def isConnected(index: int) -> bool:
+            return index < len(self._stream_configs) and connectionKey(
+                stream_configs[index]
+            ) == connectionKey(self._stream_configs[index])
+
+        # connect to new WLED instances first, so nothing changes if one of them fails
+        new_streamers = {}  # type: Dict[int, WLEDStreamer]
+        try:
+            for index, stream_config in enumerate(stream_configs):
+                if not isConnected(index):
+                    new_streamers[index] = createStreamer(stream_config)
+        except Exception:
+            for streamer in new_streamers.values():
+                streamer.close()
+            raise
+
+        # restore the quality first, so the new settings are not taken as lowered ones
+        self._closeController()
+
+        streamers = []
+        changed = []
+        replaced = self.pipeline.streamers[len(stream_configs) :]
+        with self.pipeline.lock:
+            for index, stream_config in enumerate(stream_configs):
+                if index in new_streamers:
+                    streamer = new_streamers[index]
+                    if index < len(self.pipeline.streamers):
+                        replaced.append(self.pipeline.streamers[index])
+                    self.logger.info("Connected to WLED instance %d" % index)
+                    changed.append(index)
+                else:
+                    streamer = self.pipeline.streamers[index]
+                    settings = {
+                        key: stream_config.get(key, default)
+                        for key, default in STREAMER_SETTINGS.items()
+                    }
+                    if streamer.configure(**settings):
+                        self.logger.info(
+                            "Changed settings of WLED instance %d" % index
+                        )
+                        changed.append(index)
+                streamers.append(streamer)
+
+            self.pipeline.streamers[:] = streamers
+
+        # the output thread no longer sends to the replaced streamers
+        for streamer in replaced:
+            streamer.close()
+        self._stream_configs = stream_configs
+        self._resetController()
+        self._updatePlayer(changed)
+
+        self.logger.info("Reloaded %s" % self._config_file)
+        return self._status()
+
+    def _checkConfig(self, config: Dict[str, Any]) -> None:
+        for section in self.UNSUPPORTED_SECTIONS:
+            if config.get(section):
+                self.logger.error(
+                    "[[%s]] in %s is not supported with --daemon; ignoring it"
+                    % (section, self._config_file)
+                )
+
+    def _resetController(self) -> None:
+        self._closeController()
+        if self._adaptive and self._player and not getattr(self._player, "prepared", False):
+            self._controller = QualityController(self._player, self.pipeline.streamers)
+
+    def _updatePlayer(self, changed: List[int]) -> None:
+        # the desktop is only grabbed where the streamers crop it
+        if hasattr(self._player, "setCrops"):
+            self._player.setCrops([streamer.crop for streamer in self.pipeline.streamers])
+        # images are processed for each streamer up front, and only again for the streamers
+        # with changed settings
+        if hasattr(self._player, "prepare"):
+            self._player.prepare(self.pipeline.streamers, changed)
+
+    def _closeController(self) -> None:
+        if self._controller is not None:
+            self._controller.reset()
+        self._controller = None
+
+    def _closePlayer(self) -> None:
+        self._closeController()
+        if self._player is not None:
+            self._player.stop()
+        self._player = None
@@ -0,0 +1,171 @@
+import cv2
+import numpy as np
+
+import logging
+import socket
+import struct
+
+from typing import List, Tuple
+from urllib.parse import urlparse
+
+from .framepool import FramePool
+from .metrics import metrics
+from .utils import logger_handler
+
+# flags, sequence number, data type, destination id, data offset, data length
+DDP_HEADER = struct.Struct("!BBBBLH")
+DDP_TIMECODE_SIZE = 4
+
+DDP_PUSH = 0x01
+DDP_QUERY = 0x02
+DDP_REPLY = 0x04
+DDP_TIMECODE = 0x10
+DDP_VERSION_MASK = 0xC0
+DDP_VERSION_1 = 0x40
+
+# destination id of the pixels to display; other ids are for control, config or status
+DDP_ID_DISPLAY = 1
+
+
+def isDDPSource(source) -> bool:
+    return isinstance(source, str) and source.startswith("ddp://")
+
+
+def parseDDPSource(source: str) -> Tuple[str, int, int, int]:
+    """
+    Parses a source like ddp://0.0.0.0:4048/64x32 into the address and port to listen on,
+    and the width and height of the canvas that is sent to it.
+    """
+    url = urlparse(source)
+    try:
+        width, height = [int(size) for size in url.path.strip("/").split("x")]
+    except ValueError:
+        raise ValueError(
+            "Specify the size of the DDP canvas, like ddp://0.0.0.0:4048/64x32"
+        )
+    return url.hostname or "0.0.0.0", url.port or 4048, width, height
+
+
+def isLocalAddress(ip: str) -> bool:
+    """Whether an IP address belongs to this computer"""
+    if ip.startswith("127."):
+        return True
+    probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        probe.bind((ip, 0))
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+
+class DDPSource:
+    """
+    Receives frames sent with DDP, eg by xLights or a lighting desk, so they can be cropped,
+    scaled and sent on to WLED instances. Packets are received into a preallocated buffer
+    and copied into the canvas at their offset; a packet with the push flag completes a
+    frame.
+    """
+
+    MAX_PACKET_SIZE = 65536
+    TIMEOUT = 0.5  # seconds; how often a blocked read checks whether it was stopped
+
+    def __init__(self, source: str, outputs: List[Tuple[str, int]] = []) -> None:
+        self.logger = logging.getLogger("DDPSource")
+        self.logger.propagate = False
+        self.logger.addHandler(logger_handler())
+        self.logger.setLevel(logging.DEBUG)
+
+        host, port, self.width, self.height = parseDDPSource(source)
+
+        # relaying to the address that is listened on would receive its own frames forever
+        listen_ip = socket.gethostbyname(host)
+        for output_ip, output_port in outputs:
+            if output_port == port and (
+                output_ip == listen_ip
+                or (listen_ip == "0.0.0.0" and isLocalAddress(output_ip))
+            ):
+                raise ValueError(
+                    "Can not relay DDP received on %s:%d to itself (%s:%d)"
+                    % (host, port, output_ip, output_port)
+                )
+
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((host, port))
+        self._socket.settimeout(self.TIMEOUT)
+
+        self._packet = bytearray(self.MAX_PACKET_SIZE)
+        self._packet_view = memoryview(self._packet)
+
+        # the canvas is in RGB order, as it is received
+        self._canvas = np.zeros((self.height, self.width, 3), np.uint8)
+        self._canvas_view = memoryview(self._canvas.reshape(-1))
+        self._canvas_size = self._canvas.size
+
+        # frames in BGR order, returned by read() until they are released
+        self._pool = FramePool(4)
+
+        # some senders never set the push flag; then a frame is complete at the end of
+        # the canvas
+        self._push_seen = False
+        self._stopped = False
+
+        self.logger.info(
+            "Listening for DDP on %s:%d (%dx%d)" % (host, port, self.width, self.height)
+        )
+
+    def read(self) -> np.ndarray:
+        while not self._stopped:
+            try:
+                size = self._socket.recv_into(self._packet)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+
+            if size < DDP_HEADER.size:
+                continue
+            flags, _, _, destination, offset, length = DDP_HEADER.unpack_from(
+                self._packet
+            )
+            if (
+                flags & DDP_VERSION_MASK != DDP_VERSION_1
+                or flags & (DDP_QUERY | DDP_REPLY)
+                or destination != DDP_ID_DISPLAY
+            ):
+                continue
+            metrics.count("ddp packets received")
+
+            data_start = DDP_HEADER.size
+            if flags & DDP_TIMECODE:
+                data_start += DDP_TIMECODE_SIZE
+            length = min(length, size - data_start, self._canvas_size - offset)
+            if length > 0:
+                self._canvas_view[offset : offset + length] = self._packet_view[
+                    data_start : data_start + length
+                ]
+
+            if flags & DDP_PUSH:
+                self._push_seen = True
+            elif self._push_seen or offset + length < self._canvas_size:
+                continue
+
+            frame = self._pool.acquire(self._canvas.shape)
+            cv2.cvtColor(self._canvas, cv2.COLOR_RGB2BGR, dst=frame)
+            metrics.count("ddp frames received")
+            return frame
+
+        return None
+
+    def retain(self, frame: np.ndarray, count: int = 1) -> None:
+        self._pool.retain(frame, count)
+
+    def release(self, frame: np.ndarray) -> None:
+        self._pool.release(frame)
+
+    def stop(self) -> None:
+        self._stopped = True
+        self._socket.close()
+        self._pool.clear()
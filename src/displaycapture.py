@@ -1,17 +1,160 @@
-from vidgear.gears import ScreenGear
+import cv2
+import numpy as np
 
+import sys
 import time
 
-class DisplayCapture(ScreenGear):
-    def __init__(self, monitor=None, backend=None, colorspace=None, logging=False, **options) -> None:
-        super().__init__(
-            monitor, "dxcam", colorspace, logging, **options
-        )
+from typing import List
+
+try:
+    import mss
+except ImportError:
+    mss = None
+
+if sys.platform == "win32":
+    from vidgear.gears import ScreenGear
+else:
+    ScreenGear = object
+
+
+class FramePacer:
+    def __init__(self, fps: float = 30) -> None:
+        self.framerate = fps
+        self._period = 1 / fps
+        self._next_time = time.perf_counter()
+
+    def wait(self) -> None:
+        now = time.perf_counter()
+        delay = self._next_time - now
+        if delay > 0:
+            time.sleep(delay)
+            now += delay
+        # don't try to catch up on frames that were missed
+        self._next_time = max(self._next_time + self._period, now)
+
+
+class DXCamDisplayCapture(ScreenGear):
+    def __init__(
+        self, monitor=None, fps: float = 30, colorspace=None, logging=False, **options
+    ) -> None:
+        super().__init__(monitor, "dxcam", colorspace, logging, **options)
+
+        self._pacer = FramePacer(fps)
+        self.framerate = fps
 
         self.start()
 
     def read(self):
-        result = super().read()
-        time.sleep(0.1)
+        self._pacer.wait()
+        return super().read()
+
+
+class MSSDisplayCapture:
+    """
+    Grabs the desktop using mss, which uses XShm on Linux. Only the part of the screen that
+    is cropped by the streamers is grabbed; it is placed in a reused full screen frame, so
+    the crops of the streamers still apply.
+    """
+
+    def __init__(
+        self, monitor: int = 1, fps: float = 30, crops: List[List[int]] = []
+    ) -> None:
+        if mss is None:
+            raise ImportError("Grabbing the desktop requires the mss package")
+
+        self.framerate = fps
+        self.decode_time = 0.0
+
+        self._monitor_index = monitor
+        self._crops = crops
+        self._pacer = FramePacer(fps)
+
+        # mss instances can only be used on the thread that created them
+        self._mss = None
+        self._monitor = None
+        self._region = None
+        self._buffers = []
+        self._views = []
+        self._buffer_index = 0
+        self._scaled = None
+
+    def setCrops(self, crops: List[List[int]]) -> None:
+        self._crops = crops
+        self._region = None
+
+    def read(self) -> np.ndarray:
+        if self._mss is None:
+            self._mss = mss.mss()
+            self._monitor = self._mss.monitors[self._monitor_index]
+        if self._region is None:
+            self._updateRegion()
+
+        self._pacer.wait()
+
+        grab_start_time = time.perf_counter()
+        screenshot = self._mss.grab(self._region)
+        image = np.frombuffer(screenshot.raw, np.uint8).reshape(
+            (screenshot.height, screenshot.width, 4)
+        )
+
+        # on HiDPI displays, eg Retina, mss grabs more pixels than the region has; scale
+        # them down so the frame stays in the coordinates of the monitor, like the crops
+        region_size = (self._region["width"], self._region["height"])
+        if (screenshot.width, screenshot.height) != region_size:
+            if self._scaled is None or self._scaled.shape[:2] != region_size[::-1]:
+                self._scaled = np.empty((region_size[1], region_size[0], 4), np.uint8)
+            image = cv2.resize(
+                image, region_size, dst=self._scaled, interpolation=cv2.INTER_AREA
+            )
+
+        # alternate between buffers, so the previous frame stays intact
+        index = self._buffer_index
+        self._buffer_index = 1 - index
+        view = self._views[index]
+        frame = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR, dst=view)
+        if frame is not view:
+            # OpenCV did not convert into the buffer
+            view[...] = frame
+        self.decode_time = time.perf_counter() - grab_start_time
+
+        return self._buffers[index]
+
+    def stop(self) -> None:
+        if self._mss is not None:
+            self._mss.close()
+            self._mss = None
+
+    def _updateRegion(self) -> None:
+        width = self._monitor["width"]
+        height = self._monitor["height"]
+
+        left, top, right, bottom = width, height, 0, 0
+        for crop in self._crops:
+            if not crop:
+                left, top, right, bottom = 0, 0, width, height
+                break
+            left = min(left, crop[0])
+            top = min(top, crop[1])
+            right = max(right, width - crop[2])
+            bottom = max(bottom, height - crop[3])
+        left, top = max(left, 0), max(top, 0)
+        right, bottom = min(right, width), min(bottom, height)
+        if right <= left or bottom <= top:
+            left, top, right, bottom = 0, 0, width, height
+
+        self._region = {
+            "left": self._monitor["left"] + left,
+            "top": self._monitor["top"] + top,
+            "width": right - left,
+            "height": bottom - top,
+        }
+
+        self._buffers = [np.zeros((height, width, 3), np.uint8) for _ in range(2)]
+        self._views = [buffer[top:bottom, left:right] for buffer in self._buffers]
+        self._buffer_index = 0
+
 
-        return result
\ No newline at end of file
+def createDisplayCapture(fps: float = 30, crops: List[List[int]] = []):
+    if sys.platform == "win32":
+        return DXCamDisplayCapture(fps=fps)
+    return MSSDisplayCapture(fps=fps, crops=crops)
@@ -0,0 +1,75 @@
+import numpy as np
+
+import threading
+
+from typing import Tuple
+
+from .metrics import metrics
+
+
+class FramePool:
+    """
+    A bounded pool of preallocated frame buffers. Acquired buffers are reference counted,
+    and return to the pool when they are released by every user. Acquiring a buffer blocks
+    while all buffers are in use.
+    """
+
+    def __init__(self, size: int = 16) -> None:
+        self.size = size
+
+        self._available = threading.Condition()
+        self._free = []  # type: List[np.ndarray]
+        self._references = {}  # type: Dict[int, List[Any]]
+
+        # number of buffers that had to be allocated
+        self.allocations = 0
+
+    def acquire(
+        self, shape: Tuple[int, ...], dtype=np.uint8, timeout: float = None
+    ) -> np.ndarray:
+        with self._available:
+            while True:
+                for index, buffer in enumerate(self._free):
+                    if buffer.shape == shape and buffer.dtype == dtype:
+                        del self._free[index]
+                        self._references[id(buffer)] = [buffer, 1]
+                        return buffer
+
+                if len(self._references) < self.size:
+                    # make room by dropping a free buffer of a different shape
+                    if len(self._references) + len(self._free) >= self.size:
+                        self._free.pop(0)
+                    buffer = np.empty(shape, dtype)
+                    self.allocations += 1
+                    metrics.count("frame allocations")
+                    self._references[id(buffer)] = [buffer, 1]
+                    return buffer
+
+                if not self._available.wait(timeout):
+                    raise TimeoutError("No frame buffer available")
+
+    def owns(self, buffer: np.ndarray) -> bool:
+        return id(buffer) in self._references
+
+    def retain(self, buffer: np.ndarray, count: int = 1) -> None:
+        with self._available:
+            reference = self._references.get(id(buffer))
+            if reference is not None:
+                reference[1] += count
+
+    def release(self, buffer: np.ndarray) -> None:
+        with self._available:
+            reference = self._references.get(id(buffer))
+            if reference is None:
+                return
+            reference[1] -= 1
+            if reference[1] <= 0:
+                del self._references[id(buffer)]
+                self._free.append(buffer)
+                self._available.notify()
+
+    def clear(self) -> None:
+        with self._available:
+            self._free = []
+            self._references = {}
+            self._available.notify_all()
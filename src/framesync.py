@@ -0,0 +1,71 @@
+import logging
+import socket
+import time
+
+from typing import List
+
+from .metrics import metrics
+from .udpstreamer import UDPWLEDStreamer
+from .utils import logger_handler
+from .wledstreamer import WLEDStreamer
+
+
+class FrameSync:
+    """
+    Makes all WLED instances display a frame at the same time. The frame data is sent to
+    every instance without the DDP push flag, after which all instances are told to push it,
+    either with one broadcast packet or with a burst of packets to each instance.
+    """
+
+    MODES = ["burst", "broadcast"]
+
+    def __init__(
+        self, mode: str = "burst", broadcast_address: str = "255.255.255.255"
+    ) -> None:
+        self.logger = logging.getLogger("FrameSync")
+        self.logger.propagate = False
+        self.logger.addHandler(logger_handler())
+        self.logger.setLevel(logging.DEBUG)
+
+        self.mode = mode
+
+        # time between pushing the first and the last WLED instance
+        self.skew = 0.0
+
+        self._socket = None
+        if self.mode == "broadcast":
+            self._broadcast_address = broadcast_address
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            self._push_message = UDPWLEDStreamer.pushMessage()
+
+        self.logger.debug("Synchronising frames using %s push" % self.mode)
+
+    def push(self, streamers: List[WLEDStreamer]) -> None:
+        first_push_time = None
+
+        if self.mode == "broadcast":
+            # one packet for each port that is in use
+            ports = {
+                streamer.port
+                for streamer in streamers
+                if isinstance(streamer, UDPWLEDStreamer)
+            }
+            for port in ports:
+                self._socket.sendto(self._push_message, (self._broadcast_address, port))
+                if first_push_time is None:
+                    first_push_time = time.perf_counter()
+        else:
+            for streamer in streamers:
+                if isinstance(streamer, UDPWLEDStreamer):
+                    streamer.push()
+                    if first_push_time is None:
+                        first_push_time = time.perf_counter()
+
+        if first_push_time is not None:
+            self.skew = time.perf_counter() - first_push_time
+            metrics.add("sync skew", self.skew)
+
+    def close(self) -> None:
+        if self._socket:
+            self._socket.close()
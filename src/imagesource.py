@@ -0,0 +1,206 @@
+import cv2
+import numpy as np
+
+import glob
+import logging
+import os
+import time
+
+from typing import List, Optional, Tuple
+
+try:
+    from PIL import Image, ImageSequence
+except ImportError:
+    Image = None
+
+from .utils import logger_handler
+from .wledstreamer import WLEDStreamer
+
+STILL_EXTENSIONS = [".png", ".jpg", ".jpeg", ".bmp", ".webp", ".tif", ".tiff"]
+ANIMATED_EXTENSIONS = [".gif", ".apng"]
+VIDEO_EXTENSIONS = [
+    ".mp4",
+    ".m4v",
+    ".mkv",
+    ".webm",
+    ".avi",
+    ".mov",
+    ".mpg",
+    ".mpeg",
+    ".ts",
+    ".flv",
+    ".wmv",
+    ".ogv",
+]
+
+
+def isImagePattern(source: str) -> bool:
+    """
+    Whether a source is a wildcard pattern for an image sequence. Existing files and videos
+    are never patterns, even if their name contains wildcard characters, like the
+    'Title [id].mp4' files of yt-dlp.
+    """
+    return (
+        glob.has_magic(source)
+        and not os.path.isfile(source)
+        and os.path.splitext(source)[1].lower() not in VIDEO_EXTENSIONS
+    )
+
+
+def isImageSource(source) -> bool:
+    if not isinstance(source, str) or "://" in source:
+        return False
+    if os.path.isdir(source) or isImagePattern(source):
+        return True
+    extension = os.path.splitext(source)[1].lower()
+    return extension in STILL_EXTENSIONS + ANIMATED_EXTENSIONS
+
+
+class ImageSource:
+    """
+    Plays still images, animated GIFs and image sequences. All frames are decoded once and
+    processed for each streamer up front, after which they are played back with their own
+    frame delays. A still image is only sent again at a keepalive rate, to keep WLED in
+    realtime mode.
+    """
+
+    # frames returned by read() have already been processed for each streamer
+    prepared = True
+
+    KEEPALIVE_INTERVAL = 1.0  # seconds; WLED leaves realtime mode after 2.5 seconds
+    DEFAULT_DELAY = 0.1  # seconds, for GIF frames without a (valid) duration
+
+    def __init__(
+        self,
+        source: str,
+        streamers: List[WLEDStreamer],
+        loop: int = 0,
+        fps: float = 25,
+    ) -> None:
+        self.logger = logging.getLogger("ImageSource")
+        self.logger.propagate = False
+        self.logger.addHandler(logger_handler())
+        self.logger.setLevel(logging.DEBUG)
+
+        self._source = source
+        self._loop = loop
+        self._fps = fps
+
+        # the decoded frames are kept, so they can be processed again when the settings of
+        # a streamer change
+        self._source_frames, self._delays = self._loadFrames()
+        self._frames = []  # type: List[np.ndarray]
+        self.prepare(streamers)
+
+        self._position = 0
+        self._next_time = None
+
+    def prepare(
+        self, streamers: List[WLEDStreamer], changed: Optional[List[int]] = None
+    ) -> None:
+        """
+        Processes the decoded frames for each streamer, or only for the streamers with an
+        index in changed (and any streamers that were added).
+        """
+        start_time = time.perf_counter()
+
+        # one array with all frames for each streamer
+        frames = self._frames[: len(streamers)]
+        for index, streamer in enumerate(streamers):
+            if index < len(frames) and changed is not None and index not in changed:
+                continue
+            stream_frames = np.empty(
+                (len(self._source_frames), streamer.height, streamer.width, 3), np.uint8
+            )
+            for frame_index, frame in enumerate(self._source_frames):
+                stream_frame = streamer.cropFrame(frame)
+                stream_frame = streamer.scaleFrame(stream_frame)
+                stream_frames[frame_index] = streamer.gammaCorrectFrame(stream_frame)
+            if index < len(frames):
+                frames[index] = stream_frames
+            else:
+                frames.append(stream_frames)
+        self._frames = frames
+
+        self.logger.debug(
+            "Prepared %d frame(s) in %.2fs"
+            % (len(self._source_frames), time.perf_counter() - start_time)
+        )
+        self._next_time = None
+
+    @property
+    def still(self) -> bool:
+        return len(self._delays) == 1
+
+    def read(self) -> List[np.ndarray]:
+        now = time.perf_counter()
+        if self._next_time is None:
+            self._next_time = now
+        elif self.still:
+            # resend a still image only to keep WLED in realtime mode
+            self._next_time += self.KEEPALIVE_INTERVAL
+        else:
+            self._next_time += self._delays[self._position]
+            self._position += 1
+            if self._position >= len(self._delays):
+                if self._loop == 0:
+                    return None
+                if self._loop > 0:
+                    self._loop -= 1
+                self._position = 0
+
+        delay = self._next_time - now
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            # don't try to catch up on frames that were missed
+            self._next_time = now
+
+        return [stream_frames[self._position] for stream_frames in self._frames]
+
+    def stop(self) -> None:
+        self._source_frames = []
+        self._frames = []
+
+    def _loadFrames(self) -> Tuple[List[np.ndarray], List[float]]:
+        if os.path.isdir(self._source) or isImagePattern(self._source):
+            pattern = (
+                os.path.join(self._source, "*")
+                if os.path.isdir(self._source)
+                else self._source
+            )
+            filenames = sorted(
+                filename
+                for filename in glob.glob(pattern)
+                if os.path.splitext(filename)[1].lower() in STILL_EXTENSIONS
+            )
+            frames = [cv2.imread(filename) for filename in filenames]
+            frames = [frame for frame in frames if frame is not None]
+            delays = [1 / self._fps] * len(frames)
+
+        elif (
+            os.path.splitext(self._source)[1].lower() in ANIMATED_EXTENSIONS
+            and Image is not None
+        ):
+            frames = []
+            delays = []
+            with Image.open(self._source) as image:
+                for image_frame in ImageSequence.Iterator(image):
+                    frames.append(
+                        cv2.cvtColor(
+                            np.asarray(image_frame.convert("RGB")), cv2.COLOR_RGB2BGR
+                        )
+                    )
+                    duration = image_frame.info.get("duration", 0) / 1000
+                    # like browsers, treat very short durations as the default
+                    delays.append(duration if duration > 0.01 else self.DEFAULT_DELAY)
+
+        else:
+            frame = cv2.imread(self._source)
+            frames = [frame] if frame is not None else []
+            delays = [self.KEEPALIVE_INTERVAL] * len(frames)
+
+        if not frames:
+            raise RuntimeError("Could not load any images from %s" % self._source)
+
+        return frames, delays
@@ -0,0 +1,145 @@
+import cv2
+import numpy as np
+
+import time
+
+from typing import Optional
+
+
+class Transition:
+    """The change from one source frame to the next, at LED resolution"""
+
+    def __init__(
+        self,
+        previous: np.ndarray,
+        current: np.ndarray,
+        start_time: float,
+        duration: float,
+        prepared: bool,
+        flow: np.ndarray = None,
+    ) -> None:
+        self.previous = previous
+        self.current = current
+        self.start_time = start_time
+        self.duration = duration
+        self.prepared = prepared
+        self.flow = flow
+        self.finished = False
+
+
+class FrameInterpolator:
+    """
+    Synthesises frames in between the frames of the source, so WLED can be updated at a
+    higher frame rate than the source has. Each source frame is faded (or, with optical
+    flow, moved) in during the time between the last two source frames, which delays the
+    output by one source frame.
+    """
+
+    MODES = ["crossfade", "flow"]
+
+    def __init__(self, mode: str = "crossfade") -> None:
+        self.mode = mode
+
+        self._transition = None  # type: Optional[Transition]
+        self._frame_interval = 0.0
+        self._grid = None  # type: Optional[np.ndarray]
+
+    def push(self, frame: np.ndarray, prepared: bool = False) -> None:
+        now = time.perf_counter()
+        # the frame may be a view on a buffer that is reused by the source
+        frame = frame.copy()
+
+        transition = self._transition
+        if transition is None or transition.current.shape != frame.shape:
+            self._frame_interval = 0.0
+            self._transition = Transition(frame, frame, now, 0.0, prepared)
+            return
+
+        # source frames arrive with some jitter, and sometimes after a pause
+        frame_interval = now - transition.start_time
+        if self._frame_interval:
+            self._frame_interval = 0.9 * self._frame_interval + 0.1 * frame_interval
+        else:
+            self._frame_interval = frame_interval
+
+        previous = transition.current
+        flow = self._flow(previous, frame) if self.mode == "flow" else None
+        self._transition = Transition(
+            previous,
+            frame,
+            now,
+            min(self._frame_interval, frame_interval),
+            prepared,
+            flow,
+        )
+
+    def frameAt(self, timestamp: float) -> (Optional[np.ndarray], bool):
+        """
+        Returns the frame to show at timestamp, and whether it has been prepared by the
+        source. No frame is returned once a transition has finished, until the next source
+        frame is pushed.
+        """
+        transition = self._transition
+        if transition is None or transition.finished:
+            return None, False
+
+        if transition.duration <= 0:
+            progress = 1.0
+        else:
+            progress = (timestamp - transition.start_time) / transition.duration
+        if progress >= 1:
+            transition.finished = True
+            return transition.current, transition.prepared
+
+        progress = max(progress, 0.0)
+        if transition.flow is None:
+            frame = cv2.addWeighted(
+                transition.previous, 1 - progress, transition.current, progress, 0
+            )
+        else:
+            frame = self._warpBlend(transition, progress)
+
+        return frame, transition.prepared
+
+    def _flow(self, previous: np.ndarray, current: np.ndarray) -> np.ndarray:
+        flow = cv2.calcOpticalFlowFarneback(
+            cv2.cvtColor(previous, cv2.COLOR_BGR2GRAY),
+            cv2.cvtColor(current, cv2.COLOR_BGR2GRAY),
+            None,
+            pyr_scale=0.5,
+            levels=2,
+            winsize=5,
+            iterations=3,
+            poly_n=5,
+            poly_sigma=1.1,
+            flags=0,
+        )
+
+        height, width = flow.shape[:2]
+        if self._grid is None or self._grid.shape[:2] != (height, width):
+            grid_x, grid_y = np.meshgrid(
+                np.arange(width, dtype=np.float32), np.arange(height, dtype=np.float32)
+            )
+            self._grid = np.dstack((grid_x, grid_y))
+
+        return flow
+
+    def _warpBlend(self, transition: Transition, progress: float) -> np.ndarray:
+        # move the previous frame forward, and the current frame back, along the flow
+        previous_map = self._grid - progress * transition.flow
+        current_map = self._grid + (1 - progress) * transition.flow
+        previous = cv2.remap(
+            transition.previous,
+            previous_map,
+            None,
+            cv2.INTER_LINEAR,
+            borderMode=cv2.BORDER_REPLICATE,
+        )
+        current = cv2.remap(
+            transition.current,
+            current_map,
+            None,
+            cv2.INTER_LINEAR,
+            borderMode=cv2.BORDER_REPLICATE,
+        )
+        return cv2.addWeighted(previous, 1 - progress, current, progress, 0)
@@ -0,0 +1,134 @@
+import bisect
+import json
+import logging
+import os
+import shutil
+import subprocess
+
+from typing import List, Optional
+
+from .utils import logger_handler
+
+logger = logging.getLogger("KeyframeIndex")
+logger.propagate = False
+logger.addHandler(logger_handler())
+logger.setLevel(logging.DEBUG)
+
+
+class KeyframeIndex:
+    """
+    The timestamps of the keyframes in a video file, so seeking only needs to decode frames
+    from the nearest keyframe. The index is built once with ffprobe and cached in a file
+    next to the video.
+    """
+
+    CACHE_SUFFIX = ".keyframes.json"
+    VERSION = 1
+
+    def __init__(self, keyframes: List[float]) -> None:
+        self.keyframes = keyframes
+
+    def keyframeBefore(self, timestamp: float) -> float:
+        index = bisect.bisect_right(self.keyframes, timestamp) - 1
+        return self.keyframes[max(index, 0)]
+
+    def segments(self, duration: float, count: int) -> List[float]:
+        """
+        Splits the video into about count parts that start at a keyframe, returning the
+        boundaries from 0 to duration.
+        """
+        boundaries = [0.0]
+        for index in range(1, count):
+            keyframe = self.keyframeBefore(duration * index / count)
+            if keyframe > boundaries[-1] and keyframe < duration:
+                boundaries.append(keyframe)
+        boundaries.append(duration)
+        return boundaries
+
+    @classmethod
+    def load(cls, filename: str) -> Optional["KeyframeIndex"]:
+        if not os.path.isfile(filename):
+            return None
+
+        stat = os.stat(filename)
+        cache_filename = filename + cls.CACHE_SUFFIX
+        try:
+            with open(cache_filename, "r") as cache_file:
+                cache = json.load(cache_file)
+            if (
+                cache["version"] == cls.VERSION
+                and cache["size"] == stat.st_size
+                and cache["mtime"] == stat.st_mtime
+            ):
+                return cls(cache["keyframes"])
+        except (OSError, ValueError, KeyError):
+            pass
+
+        keyframes = cls._probeKeyframes(filename)
+        if not keyframes:
+            return None
+
+        try:
+            with open(cache_filename, "w") as cache_file:
+                json.dump(
+                    {
+                        "version": cls.VERSION,
+                        "size": stat.st_size,
+                        "mtime": stat.st_mtime,
+                        "keyframes": keyframes,
+                    },
+                    cache_file,
+                )
+        except OSError:
+            logger.warning("Could not store keyframe index in %s" % cache_filename)
+
+        return cls(keyframes)
+
+    @staticmethod
+    def _probeKeyframes(filename: str) -> List[float]:
+        ffprobe = shutil.which("ffprobe")
+        if ffprobe is None:
+            logger.warning("ffprobe not found; seeking without keyframe index")
+            return []
+
+        logger.info("Building keyframe index for %s..." % filename)
+        try:
+            # only reads the packets, without decoding any frames
+            output = subprocess.run(
+                [
+                    ffprobe,
+                    "-v",
+                    "error",
+                    "-select_streams",
+                    "v:0",
+                    "-show_entries",
+                    "packet=pts_time,flags",
+                    "-of",
+                    "csv=print_section=0",
+                    filename,
+                ],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+        except (OSError, subprocess.CalledProcessError):
+            logger.warning("Could not build keyframe index for %s" % filename)
+            return []
+
+        timestamps = []
+        keyframes = []
+        for line in output.splitlines():
+            fields = line.split(",")
+            try:
+                timestamp = float(fields[0])
+            except (ValueError, IndexError):
+                continue
+            timestamps.append(timestamp)
+            if len(fields) > 1 and "K" in fields[1]:
+                keyframes.append(timestamp)
+        if not keyframes:
+            return []
+
+        # timestamps relative to the first frame, in presentation order
+        start_time = min(timestamps)
+        return sorted(keyframe - start_time for keyframe in keyframes)
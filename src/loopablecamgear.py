@@ -41,6 +41,10 @@ from vidgear.gears.camgear import (
     YT_backend as YT_backend
 )
 
+from .framepool import FramePool
+from .keyframeindex import KeyframeIndex
+from .metrics import metrics
+
 # define logger
 logger = log.getLogger("LoopableCamGear")
 logger.propagate = False
@@ -70,6 +74,8 @@ class LoopableCamGear:
         time_delay=0,
         loop=0,
         nosync=False,
+        start=0,
+        end=0,
         **options
     ):
         """
@@ -82,6 +88,10 @@ class LoopableCamGear:
             colorspace (str): selects the colorspace of the input stream.
             logging (bool): enables/disables logging.
             time_delay (int): time delay (in sec) before start reading the frames.
+            loop (int): number of times to loop the video, -1 for infinite looping.
+            nosync (bool): read frames as fast as possible instead of at the framerate of the video.
+            start (float): time (in sec) in the video to start playing (and looping) from.
+            end (float): time (in sec) in the video to stop playing (or loop) at, 0 for the end of the video.
             options (dict): provides ability to alter Source Tweak Parameters.
         """
         # print current version
@@ -186,6 +196,11 @@ class LoopableCamGear:
         else:
             # defaults to 5mins timeout
             self.__thread_timeout = None
+        # Frame Pool size
+        frame_pool_size = options.pop("FRAME_POOL_SIZE", 16)
+        if not isinstance(frame_pool_size, int) or frame_pool_size < 0:
+            # reset improper values
+            frame_pool_size = 16
 
         self.__queue = None
         # initialize queue for video files only
@@ -204,6 +219,16 @@ class LoopableCamGear:
                 "Threaded Queue Mode is disabled for the current video source!"
             )
 
+        # initialize pool of reusable frame buffers for the queue
+        self.__pool = None
+        if self.__threaded_queue_mode and frame_pool_size > 0:
+            self.__pool = FramePool(frame_pool_size)
+            self.__logging and logger.debug(
+                "Reusing a pool of {} frame buffers.".format(frame_pool_size)
+            )
+        # buffer that frames are decoded into before converting them to another colorspace
+        self.__decode_buffer = None
+
         if self.__thread_timeout:
             logger.debug(
                 "Setting Video-Thread Timeout to {}s.".format(self.__thread_timeout)
@@ -258,15 +283,44 @@ class LoopableCamGear:
         if time_delay and isinstance(time_delay, (int, float)):
             time.sleep(time_delay)
 
+        # segment of the video to play, in frames
+        self.__keyframe_index = None
+        self.__start_frame = 0
+        self.__end_frame = 0
+        self.__position = 0
+        if (start or end) and isinstance(source, str) and self.framerate:
+            self.__start_frame = int(round(start * self.framerate))
+            self.__end_frame = int(round(end * self.framerate))
+            self.__keyframe_index = KeyframeIndex.load(source)
+            logger.debug(
+                "Playing segment from {}s to {}.".format(
+                    start, "{}s".format(end) if end else "the end"
+                )
+            )
+            if self.__start_frame:
+                self.__seek(self.__start_frame)
+
         # frame variable initialization
         (grabbed, self.frame) = self.stream.read()
 
+        # decoding time of the last frame, and request to change the capture resolution
+        self.decode_time = 0.0
+        self.__camera_mode = isinstance(source, int)
+        self.native_size = None
+        self.__resolution_scale = None
+
         # check if valid stream
         if grabbed:
+            self.native_size = (self.frame.shape[1], self.frame.shape[0])
+
             # render colorspace if defined
             if not (self.color_space is None):
                 self.frame = cv2.cvtColor(self.frame, self.color_space)
 
+            # shape of the frames in the queue
+            self.__frame_shape = self.frame.shape
+            self.__position += 1
+
             if self.__threaded_queue_mode:
                 # initialize and append to queue
                 self.__queue.put(self.frame)
@@ -306,43 +360,87 @@ class LoopableCamGear:
         # until the thread is terminated
         # or frames runs out
         # if the thread indicator variable is set, stop the thread
-        while not self.__terminate.wait(self.__period):
+        period = self.__period
+        # frames read since the last rewind, to notice a segment without any frames
+        segment_frames = 1
+        while not self.__terminate.wait(period):
+            period = self.__period
+
             # stream not read yet
             self.__stream_read.clear()
 
+            # change the capture resolution if requested
+            if not (self.__resolution_scale is None):
+                self.__applyResolutionScale(self.__resolution_scale)
+                self.__resolution_scale = None
+
+            # decode directly into a pooled buffer, unless the colorspace is converted
+            buffer = None
+            at_end = self.__end_frame and self.__position >= self.__end_frame
+            if at_end:
+                (grabbed, frame) = (False, None)
+            elif not (self.__pool is None) and self.color_space is None:
+                # blocks while all buffers are in use
+                buffer = self.__pool.acquire(self.__frame_shape)
+
             # otherwise, read the next frame from the stream
-            (grabbed, frame) = self.stream.read()
+            decode_start = time.perf_counter()
+            if at_end:
+                pass
+            elif not (buffer is None):
+                (grabbed, frame) = self.stream.read(image=buffer)
+                frame = self.__checkPooled(buffer, frame if grabbed else None)
+            elif not (self.__pool is None):
+                (grabbed, frame) = self.stream.read(image=self.__decode_buffer)
+                if grabbed:
+                    self.__decode_buffer = frame
+            else:
+                (grabbed, frame) = self.stream.read()
+                grabbed and metrics.count("frame allocations")
+            self.decode_time = time.perf_counter() - decode_start
+            if grabbed:
+                self.__position += 1
+                segment_frames += 1
+                metrics.count("frames decoded")
 
             # stream read completed
             self.__stream_read.set()
 
             # check for valid frame if received
             if not grabbed:
-                # no frames received, then safely exit
-                if self.__threaded_queue_mode:
-                    if self.__queue.empty():
-                        if self.__loop != 0:
-                            self.stream.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                            if self.__loop > 0: self.__loop -= 1
-                            continue
-                        else:
-                            break
-                    else:
-                        continue
+                if self.__loop != 0 and not segment_frames:
+                    # rewinding again would never produce a frame
+                    logger.warning("No frames in the segment to loop; stopping.")
+                    self.__loop = 0
+                if self.__loop != 0:
+                    # rewind without waiting for the queue to drain, so consumers
+                    # don't notice the loop boundary
+                    self.__seek(self.__start_frame)
+                    if self.__loop > 0: self.__loop -= 1
+                    segment_frames = 0
+                    # read the first frame of the loop without waiting another period
+                    period = 0
+                    continue
+                elif self.__threaded_queue_mode and not self.__queue.empty():
+                    # let the consumer read the remaining frames first
+                    continue
                 else:
-                    if self.__loop != 0:
-                        self.stream.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                        if self.__loop > 0: self.__loop -= 1
-                        continue
-                    else:
-                        break
+                    # no frames received, then safely exit
+                    break
 
             # apply colorspace to frames if valid
             if not (self.color_space is None):
                 color_frame = None
                 try:
                     if isinstance(self.color_space, int):
-                        color_frame = cv2.cvtColor(frame, self.color_space)
+                        if not (self.__pool is None):
+                            buffer = self.__pool.acquire(self.__frame_shape)
+                            color_frame = self.__checkPooled(
+                                buffer, cv2.cvtColor(frame, self.color_space, dst=buffer)
+                            )
+                        else:
+                            color_frame = cv2.cvtColor(frame, self.color_space)
+                            metrics.count("frame allocations")
                     else:
                         raise ValueError(
                             "Global color_space parameter value `{}` is not a valid!".format(
@@ -377,6 +475,67 @@ class LoopableCamGear:
         # release resources
         self.stream.release()
 
+    def __seek(self, frame_number):
+        """
+        Seeks to a frame. If a keyframe index is available, OpenCV seeks to the preceding keyframe
+        directly, after which frames are decoded up to the requested frame. This costs at most
+        one group of pictures of decoding.
+        """
+        keyframe_number = frame_number
+        if not (self.__keyframe_index is None):
+            keyframe = self.__keyframe_index.keyframeBefore(frame_number / self.framerate)
+            keyframe_number = min(int(round(keyframe * self.framerate)), frame_number)
+
+        self.stream.set(cv2.CAP_PROP_POS_FRAMES, keyframe_number)
+        for _ in range(frame_number - keyframe_number):
+            if not self.stream.grab():
+                break
+        self.__position = frame_number
+
+    def __checkPooled(self, buffer, frame):
+        """
+        Returns a pooled buffer to the pool if OpenCV did not use it for the frame, eg because
+        the frame size changed.
+        """
+        if frame is buffer:
+            return frame
+        self.__pool.release(buffer)
+        if not (frame is None):
+            # new frames will use buffers of the new size
+            self.__frame_shape = frame.shape
+            metrics.count("frame allocations")
+        return frame
+
+    def __applyResolutionScale(self, scale):
+        """
+        Changes the capture resolution of a camera, relative to its native resolution.
+        """
+        width = int(self.native_size[0] * scale)
+        height = int(self.native_size[1] * scale)
+        self.stream.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        self.stream.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        self.__logging and logger.debug(
+            "Capture resolution set to {}x{}.".format(
+                int(self.stream.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                int(self.stream.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            )
+        )
+
+    def setResolutionScale(self, scale):
+        """
+        Requests the source to be decoded at a fraction of its native resolution. This is only
+        possible for cameras; video files and streams are always decoded at their full resolution.
+
+        Parameters:
+            scale (float): the fraction of the native resolution to decode the source at.
+
+        **Returns:** True if the resolution can be changed for this source.
+        """
+        if not self.__camera_mode or self.native_size is None:
+            return False
+        self.__resolution_scale = scale
+        return True
+
     def read(self):
         """
         Extracts frames synchronously from monitored queue, while maintaining a fixed-length frame buffer in the memory,
@@ -395,6 +554,21 @@ class LoopableCamGear:
             else None
         )
 
+    def retain(self, frame, count=1):
+        """
+        Marks a frame returned by `read()` as being used by `count` more consumers.
+        """
+        if not (self.__pool is None):
+            self.__pool.retain(frame, count)
+
+    def release(self, frame):
+        """
+        Returns a frame returned by `read()` to the pool of frame buffers, once it has been
+        released by every consumer.
+        """
+        if not (self.__pool is None):
+            self.__pool.release(frame)
+
     def stop(self):
         """
         Safely terminates the thread, and release the VideoStream resources.
@@ -417,4 +591,7 @@ class LoopableCamGear:
                     except queue.Empty:
                         continue
                     self.__queue.task_done()
+            # wake up the thread if it is waiting for a frame buffer
+            if not (self.__pool is None):
+                self.__pool.clear()
             self.__thread.join()
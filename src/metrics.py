@@ -0,0 +1,132 @@
+import logging
+import sys
+import time
+import threading
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from typing import Dict, List, Optional, Tuple
+
+from .utils import logger_handler
+
+
+class Metrics:
+    REPORT_INTERVAL = 10  # seconds
+
+    def __init__(self) -> None:
+        self.logger = logging.getLogger("Metrics")
+        self.logger.propagate = False
+        self.logger.addHandler(logger_handler())
+        self.logger.setLevel(logging.DEBUG)
+
+        # nothing is collected unless metrics are enabled, or a window is open
+        self.enabled = False
+
+        self._lock = threading.Lock()
+        self._values = {}  # type: Dict[str, List[float]]
+        self._counters = {}  # type: Dict[str, int]
+        self._period_start = time.perf_counter()
+
+        # a separate collection window, eg for profiling, that report() does not reset
+        self._window = None  # type: Optional[Tuple[Dict, Dict, float]]
+
+    @property
+    def collecting(self) -> bool:
+        return self.enabled or self._window is not None
+
+    def add(self, name: str, value: float) -> None:
+        if not self.enabled and self._window is None:
+            return
+
+        with self._lock:
+            if self.enabled:
+                self._addValue(self._values, name, value)
+            if self._window is not None:
+                self._addValue(self._window[0], name, value)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        if not self.enabled and self._window is None:
+            return
+
+        with self._lock:
+            if self.enabled:
+                self._counters[name] = self._counters.get(name, 0) + amount
+            if self._window is not None:
+                counters = self._window[1]
+                counters[name] = counters.get(name, 0) + amount
+
+    def summary(self) -> List[str]:
+        with self._lock:
+            return self._summary(self._values, self._counters, self._period_start)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values = {}
+            self._counters = {}
+            self._period_start = time.perf_counter()
+
+    def report(self, force: bool = False) -> None:
+        if not self.enabled:
+            return
+        if not force and time.perf_counter() - self._period_start < self.REPORT_INTERVAL:
+            return
+
+        for line in self.summary():
+            self.logger.info(line)
+        self.reset()
+
+    def openWindow(self) -> None:
+        """Starts collecting into a separate window, whether metrics are enabled or not"""
+        with self._lock:
+            self._window = ({}, {}, time.perf_counter())
+
+    def closeWindow(self) -> List[str]:
+        """Stops collecting into the window, and returns its summary"""
+        with self._lock:
+            if self._window is None:
+                return []
+            values, counters, start_time = self._window
+            self._window = None
+            return self._summary(values, counters, start_time)
+
+    @staticmethod
+    def _addValue(values: Dict[str, List[float]], name: str, value: float) -> None:
+        try:
+            stat = values[name]
+        except KeyError:
+            values[name] = [1, value, value, value]
+            return
+        stat[0] += 1
+        stat[1] += value
+        if value < stat[2]:
+            stat[2] = value
+        if value > stat[3]:
+            stat[3] = value
+
+    @staticmethod
+    def _summary(
+        values: Dict[str, List[float]], counters: Dict[str, int], start_time: float
+    ) -> List[str]:
+        elapsed_time = max(time.perf_counter() - start_time, 1e-6)
+        lines = []
+        for name, (count, total, minimum, maximum) in sorted(values.items()):
+            lines.append(
+                "%s: avg %.2fms, min %.2fms, max %.2fms (%d samples)"
+                % (name, total / count * 1000, minimum * 1000, maximum * 1000, count)
+            )
+        for name, count in sorted(counters.items()):
+            lines.append("%s: %d (%.1f/s)" % (name, count, count / elapsed_time))
+
+        if resource is not None:
+            # ru_maxrss is in kilobytes, except on MacOS where it is in bytes
+            peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            if sys.platform == "darwin":
+                peak_rss /= 1024
+            lines.append("peak memory: %.1fMB" % (peak_rss / 1024))
+        return lines
+
+
+metrics = Metrics()
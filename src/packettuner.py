@@ -0,0 +1,132 @@
+import logging
+import math
+import socket
+import sys
+import threading
+
+from typing import Callable, List, Optional
+
+from .utils import logger_handler
+
+IP_HEADER_SIZE = 20
+UDP_HEADER_SIZE = 8
+DDP_HEADER_SIZE = 10
+DEFAULT_MTU = 1500
+
+# socket options for path MTU discovery on Linux, which Python does not define
+IP_MTU_DISCOVER = getattr(socket, "IP_MTU_DISCOVER", 10)
+IP_PMTUDISC_DO = getattr(socket, "IP_PMTUDISC_DO", 2)
+IP_MTU = getattr(socket, "IP_MTU", 14)
+
+logger = logging.getLogger("PacketTuner")
+logger.propagate = False
+logger.addHandler(logger_handler())
+logger.setLevel(logging.DEBUG)
+
+
+def probePathMTU(ip: str, port: int) -> int:
+    """
+    Returns the MTU of the path to a host, as known by the kernel. Only Linux exposes
+    this; elsewhere the MTU of Ethernet is assumed.
+    """
+    if not sys.platform.startswith("linux"):
+        return DEFAULT_MTU
+
+    probe_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        probe_socket.setsockopt(socket.IPPROTO_IP, IP_MTU_DISCOVER, IP_PMTUDISC_DO)
+        probe_socket.connect((ip, port))
+        return probe_socket.getsockopt(socket.IPPROTO_IP, IP_MTU)
+    except OSError:
+        logger.warning("Could not probe the path MTU to %s" % ip)
+        return DEFAULT_MTU
+    finally:
+        probe_socket.close()
+
+
+def maxPacketPixels(mtu: int) -> int:
+    """The number of pixels that fit in a DDP packet that is not fragmented"""
+    return (mtu - IP_HEADER_SIZE - UDP_HEADER_SIZE - DDP_HEADER_SIZE) // 3
+
+
+def fragmentCount(data_length: int, mtu: int) -> int:
+    """The number of IP fragments a DDP packet with data_length bytes is sent in"""
+    payload_length = UDP_HEADER_SIZE + DDP_HEADER_SIZE + data_length
+    # the payload of all but the last fragment is a multiple of 8 bytes
+    fragment_length = (mtu - IP_HEADER_SIZE) // 8 * 8
+    return math.ceil(payload_length / fragment_length)
+
+
+class PacketTuner:
+    """
+    Finds the packet size at which a WLED instance displays the most frames, by streaming
+    with each candidate size for a while and asking WLED for the frame rate it displays.
+    Of sizes with about the same frame rate, the largest is chosen, as it needs the fewest
+    packets.
+    """
+
+    TRIAL_DURATION = 5.0  # seconds
+    TOLERANCE = 0.05  # frame rates within 5% of the best are considered equal
+
+    def __init__(
+        self, name: str, candidates: List[int], query_fps: Callable[[], Optional[float]]
+    ) -> None:
+        self._name = name
+        self._candidates = candidates
+        self._query_fps = query_fps
+
+        # packet size to use now; changed by the tuning thread
+        self.packet_pixels = candidates[0]
+
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="PacketTuner %s" % name)
+        self._thread.daemon = True
+
+    @classmethod
+    def candidatesFor(cls, mtu: int, pixel_count: int) -> List[int]:
+        largest = maxPacketPixels(mtu)
+        candidates = [largest, 480, 240, 120]
+        candidates = [
+            min(candidate, pixel_count)
+            for candidate in candidates
+            if candidate <= largest
+        ]
+        return sorted(set(candidates), reverse=True)
+
+    def start(self) -> None:
+        if not self._thread.is_alive() and not self._stopped.is_set():
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def _run(self) -> None:
+        if len(self._candidates) == 1:
+            return
+
+        logger.info(
+            "Tuning packet size for %s, trying %s pixels"
+            % (self._name, ", ".join(str(candidate) for candidate in self._candidates))
+        )
+        results = []
+        for packet_pixels in self._candidates:
+            self.packet_pixels = packet_pixels
+            if self._stopped.wait(self.TRIAL_DURATION):
+                return
+            fps = self._query_fps()
+            if fps is None:
+                logger.warning(
+                    "Could not get the frame rate of %s; not tuning packet size" % self._name
+                )
+                self.packet_pixels = self._candidates[0]
+                return
+            logger.debug("%s: %d pixels per packet, %.1f fps" % (self._name, packet_pixels, fps))
+            results.append((fps, packet_pixels))
+
+        best_fps = max(fps for fps, _ in results)
+        self.packet_pixels = max(
+            packet_pixels
+            for fps, packet_pixels in results
+            if fps >= best_fps * (1 - self.TOLERANCE)
+        )
+        logger.info("%s: using %d pixels per packet" % (self._name, self.packet_pixels))
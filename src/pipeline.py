@@ -0,0 +1,347 @@
+import cv2
+import numpy as np
+
+import logging
+import threading
+import time
+
+from typing import Any, Dict, List, Union
+
+from .ddpsource import DDPSource, isDDPSource
+from .displaycapture import FramePacer, createDisplayCapture
+from .framesync import FrameSync
+from .imagesource import ImageSource, isImageSource
+from .interpolator import FrameInterpolator
+from .metrics import metrics
+from .qualitycontroller import QualityController
+from .recording import RecordingWriter
+from .serialstreamer import SerialWLEDStreamer
+from .udpstreamer import UDPWLEDStreamer
+from .utils import cropArgument, logger_handler, packetPixelsArgument
+from .videocapture import VideoCapture
+from .wledstreamer import WLEDStreamer
+
+# settings that can be changed without reconnecting to the WLED instance, and their defaults
+STREAMER_SETTINGS = {
+    "width": 0,
+    "height": 0,
+    "crop": [],
+    "scale": "fill",
+    "interpolation": "smooth",
+    "gamma": 0.5,
+}
+
+SCALE_MODES = ["stretch", "fill", "fit", "crop"]
+INTERPOLATION_MODES = ["hard", "smooth"]
+
+# settings of a [[wled]] group that bind it to the [[sources]] it shows
+COMPOSITION_SETTINGS = ["source", "layers"]
+
+
+def streamerSettings(
+    settings: Dict[str, Any], allow_zero_size: bool = False
+) -> Dict[str, Any]:
+    """
+    Checks and converts settings of a streamer, before any of them are applied. A width
+    and height of 0 (get them from WLED) are only allowed with allow_zero_size.
+
+    **Returns:** The converted settings; raises ValueError for an invalid setting
+    """
+    unknown_settings = set(settings) - set(STREAMER_SETTINGS)
+    if unknown_settings:
+        raise ValueError("Unknown settings: %s" % ", ".join(sorted(unknown_settings)))
+
+    settings = dict(settings)
+    for key in ["width", "height"]:
+        if key in settings:
+            value = settings[key]
+            if (
+                isinstance(value, bool)
+                or not isinstance(value, int)
+                or value < (0 if allow_zero_size else 1)
+            ):
+                raise ValueError("%s must be a positive integer" % key)
+    if "crop" in settings:
+        try:
+            settings["crop"] = cropArgument(settings["crop"])
+        except (TypeError, ValueError, AttributeError):
+            raise ValueError("crop must be 1, 2 or 4 integers")
+        if any(amount < 0 for amount in settings["crop"]):
+            raise ValueError("crop amounts can not be negative")
+    if "scale" in settings and settings["scale"] not in SCALE_MODES:
+        raise ValueError("scale must be one of %s" % ", ".join(SCALE_MODES))
+    if (
+        "interpolation" in settings
+        and settings["interpolation"] not in INTERPOLATION_MODES
+    ):
+        raise ValueError(
+            "interpolation must be one of %s" % ", ".join(INTERPOLATION_MODES)
+        )
+    if "gamma" in settings:
+        gamma = settings["gamma"]
+        if isinstance(gamma, bool) or not isinstance(gamma, (int, float)) or gamma <= 0:
+            raise ValueError("gamma must be a number larger than 0")
+        settings["gamma"] = float(gamma)
+
+    return settings
+
+
+def streamerConfig(stream_config: Dict[str, Any]) -> Dict[str, Any]:
+    stream_config = {
+        key: value
+        for key, value in stream_config.items()
+        if key not in COMPOSITION_SETTINGS
+    }
+    if "serial" in stream_config:
+        serialport = stream_config.pop("serial")
+        if serialport:
+            stream_config["serialport"] = serialport
+    stream_config.update(
+        streamerSettings(
+            {
+                key: value
+                for key, value in stream_config.items()
+                if key in STREAMER_SETTINGS
+            },
+            allow_zero_size=True,
+        )
+    )
+    if "serialport" in stream_config:
+        # tpm2 frames are not split in packets
+        stream_config.pop("packet_pixels", None)
+    elif "packet_pixels" in stream_config:
+        stream_config["packet_pixels"] = packetPixelsArgument(
+            stream_config["packet_pixels"]
+        )
+    return stream_config
+
+
+def createStreamer(stream_config: Dict[str, Any]) -> WLEDStreamer:
+    if "serialport" in stream_config:
+        return SerialWLEDStreamer(**stream_config)
+    else:
+        return UDPWLEDStreamer(**stream_config)
+
+
+def connectionKey(stream_config: Dict[str, Any]) -> tuple:
+    if "serialport" in stream_config:
+        return (
+            "serial",
+            stream_config["serialport"],
+            stream_config.get("baudrate", 115200),
+        )
+    return (
+        "udp",
+        stream_config.get("host", "127.0.0.1"),
+        stream_config.get("port", 4048),
+        stream_config.get("packet_pixels", UDPWLEDStreamer.MAX_PIXELS_PER_DATAGRAM),
+    )
+
+
+# arguments of createPlayer that can be set for each source in the config file, eg for
+# [[sources]] and [[playlist]] items
+PLAYER_SETTINGS = ["source", "camera", "display", "loop", "start", "end", "fps"]
+
+
+def createPlayer(
+    source: Union[str, int] = 0,
+    camera: bool = False,
+    display: bool = False,
+    loop: int = 0,
+    start: float = 0,
+    end: float = 0,
+    fps: float = 30,
+    streamers: List[WLEDStreamer] = [],
+):
+    if display:
+        return createDisplayCapture(
+            fps=fps, crops=[streamer.crop for streamer in streamers]
+        )
+    if not camera and isDDPSource(source):
+        return DDPSource(
+            source,
+            [streamer.address for streamer in streamers if hasattr(streamer, "address")],
+        )
+    if not camera and isImageSource(source):
+        return ImageSource(source, streamers, loop=loop, fps=fps)
+    if end and end <= start:
+        raise ValueError("The end (%gs) must be after the start (%gs)" % (end, start))
+    return VideoCapture(
+        source=int(source) if camera else source, loop=loop, start=start, end=end
+    )
+
+
+class Pipeline:
+    def __init__(
+        self,
+        streamers: List[WLEDStreamer],
+        recorder: RecordingWriter = None,
+        sync: FrameSync = None,
+        debug: bool = False,
+        output_fps: float = 0,
+        output_interpolation: str = "crossfade",
+    ) -> None:
+        self.logger = logging.getLogger("Pipeline")
+        self.logger.propagate = False
+        self.logger.addHandler(logger_handler())
+        self.logger.setLevel(logging.DEBUG)
+
+        self.streamers = streamers
+        # held by the output thread while it sends, and while the streamers are changed
+        self.lock = threading.Lock()
+        self.recorder = recorder
+        self.sync = sync
+        self.debug = debug
+
+        # with an output frame rate, frames are sent by the output thread, interpolating
+        # between the frames of the source
+        self.output_fps = output_fps
+        self.output_interpolation = output_interpolation
+        self._interpolators = []  # type: List[FrameInterpolator]
+        self._output_errors = set()  # indices of streamers that failed to send
+        self._output_stopped = threading.Event()
+        self._output_thread = None
+        if output_fps:
+            self._output_thread = threading.Thread(target=self._runOutput, name="Output")
+            self._output_thread.daemon = True
+            self._output_thread.start()
+
+    def playFrame(self, player, controller: QualityController = None) -> bool:
+        """
+        Reads a frame from the player and streams it, unless the controller skips it.
+
+        **Returns:** False once the player has no more frames
+        """
+        read_start_time = time.perf_counter()
+        frame = player.read()
+        if frame is None:
+            return False
+        metrics.add("read", time.perf_counter() - read_start_time)
+
+        if not controller or controller.shouldProcess():
+            stage_times = self.streamFrame(frame, getattr(player, "prepared", False))
+            metrics.add("decode", getattr(player, "decode_time", 0.0))
+            metrics.report()
+            if controller:
+                controller.update(stage_times)
+
+        # return the frame buffer to the pool
+        if hasattr(player, "release"):
+            player.release(frame)
+
+        return True
+
+    def streamFrame(
+        self, frame: Union[np.ndarray, List[np.ndarray]], prepared: bool = False
+    ) -> Dict[str, float]:
+        process_time = 0.0
+        send_time = 0.0
+        for index, wled_streamer in enumerate(self.streamers):
+            process_start_time = time.perf_counter()
+            if prepared:
+                if index >= len(frame) or frame[index] is None:
+                    continue
+                stream_frame = frame[index]
+            else:
+                stream_frame = wled_streamer.cropFrame(frame)
+                stream_frame = wled_streamer.scaleFrame(stream_frame)
+                if not self._output_thread:
+                    stream_frame = wled_streamer.gammaCorrectFrame(stream_frame)
+            if self._output_thread:
+                # sent by the output thread; gamma is corrected after interpolating
+                self._interpolator(index).push(stream_frame, prepared)
+                process_time += time.perf_counter() - process_start_time
+                if self.debug:
+                    if not prepared:
+                        stream_frame = wled_streamer.gammaCorrectFrame(stream_frame)
+                    cv2.imshow("wledvideo %d" % index, stream_frame)
+                continue
+            send_start_time = time.perf_counter()
+            wled_streamer.sendFrame(stream_frame, push=self.sync is None)
+            if self.recorder:
+                self.recorder.write(index, stream_frame)
+            process_time += send_start_time - process_start_time
+            send_time += time.perf_counter() - send_start_time
+
+            if self.debug:
+                cv2.imshow("wledvideo %d" % index, stream_frame)
+
+        if self.sync and not self._output_thread:
+            push_start_time = time.perf_counter()
+            self.sync.push(self.streamers)
+            send_time += time.perf_counter() - push_start_time
+
+        metrics.add("process", process_time)
+        metrics.add("send", send_time)
+
+        return {"process": process_time, "send": send_time}
+
+    def handleEvents(self) -> bool:
+        if self.debug:
+            if (cv2.waitKey(1) & 255) in [27, ord("q")]:
+                return False
+        return True
+
+    def close(self) -> None:
+        if self._output_thread:
+            self._output_stopped.set()
+            self._output_thread.join()
+        if self.recorder:
+            self.recorder.close()
+        if self.sync:
+            self.sync.close()
+
+        if self.debug:
+            cv2.destroyAllWindows()
+        for wled_streamer in self.streamers:
+            wled_streamer.close()
+
+    def _interpolator(self, index: int) -> FrameInterpolator:
+        while len(self._interpolators) <= index:
+            self._interpolators.append(FrameInterpolator(self.output_interpolation))
+        return self._interpolators[index]
+
+    def _runOutput(self) -> None:
+        pacer = FramePacer(self.output_fps)
+        while not self._output_stopped.is_set():
+            pacer.wait()
+
+            output_start_time = time.perf_counter()
+            with self.lock:
+                sent = self._sendOutput(output_start_time)
+            if sent:
+                metrics.add("output", time.perf_counter() - output_start_time)
+
+    def _sendOutput(self, timestamp: float) -> bool:
+        sent = False
+        for index, wled_streamer in enumerate(self.streamers):
+            if index >= len(self._interpolators):
+                break
+            stream_frame, prepared = self._interpolators[index].frameAt(timestamp)
+            if stream_frame is None:
+                continue
+            try:
+                if not prepared:
+                    stream_frame = wled_streamer.gammaCorrectFrame(stream_frame)
+                wled_streamer.sendFrame(stream_frame, push=self.sync is None)
+            except Exception as e:
+                # keep sending to the other streamers, and retry with the next frame
+                if index not in self._output_errors:
+                    self._output_errors.add(index)
+                    self.logger.warning(
+                        "Could not send to WLED instance %d: %s" % (index, e)
+                    )
+                continue
+            if index in self._output_errors:
+                self._output_errors.discard(index)
+                self.logger.info("Sending to WLED instance %d again" % index)
+            if self.recorder:
+                self.recorder.write(index, stream_frame)
+            sent = True
+
+        if sent and self.sync:
+            try:
+                self.sync.push(self.streamers)
+            except Exception as e:
+                self.logger.warning("Could not push frames: %s" % e)
+        return sent
@@ -0,0 +1,227 @@
+import cv2
+import numpy as np
+
+import logging
+import threading
+import time
+
+from typing import Any, Dict, List, Optional
+
+from .displaycapture import FramePacer
+from .pipeline import PLAYER_SETTINGS, createPlayer
+from .utils import logger_handler
+from .wledstreamer import WLEDStreamer
+
+
+class Playlist:
+    """
+    Plays the items of a playlist one after the other. While an item plays, the next item
+    is opened on a background thread, so it can start playing with the frame after the
+    last frame of the current item. Optionally the next item is faded in over the last
+    frame of the current item.
+    """
+
+    # frames returned by read() have already been processed for each streamer
+    prepared = True
+
+    def __init__(
+        self,
+        items: List[Dict[str, Any]],
+        streamers: List[WLEDStreamer],
+        loop: int = 0,
+        crossfade: float = 0,
+        fps: float = 30,
+    ) -> None:
+        self.logger = logging.getLogger("Playlist")
+        self.logger.propagate = False
+        self.logger.addHandler(logger_handler())
+        self.logger.setLevel(logging.DEBUG)
+
+        self._items = items
+        self._streamers = streamers
+        self._loop = loop
+        self._crossfade = crossfade
+        self._fps = fps
+
+        self._index = -1
+        self._player = None
+        self._pacer = None  # type: Optional[FramePacer]
+        self._item_start_time = None  # type: Optional[float]
+
+        self._next_index = None  # type: Optional[int]
+        self._next_player = None
+        self._next_thread = None  # type: Optional[threading.Thread]
+
+        self._current_frames = None  # type: Optional[List[np.ndarray]]
+        self._still_time = 0.0
+        self._last_frames = None  # type: Optional[List[np.ndarray]]
+        self._fade_frames = None  # type: Optional[List[np.ndarray]]
+        self._fade_start_time = 0.0
+
+        self._openNext(0)
+        self._advance()
+
+    def read(self) -> List[np.ndarray]:
+        while self._player is not None:
+            frame = None
+            duration = self._items[self._index].get("duration", 0)
+            if self._current_frames is not None and getattr(self._player, "still", False):
+                frame = self._waitStill(duration)
+            elif not duration or (
+                self._item_start_time is None
+                or time.perf_counter() - self._item_start_time < duration
+            ):
+                if self._pacer:
+                    self._pacer.wait()
+                frame = self._player.read()
+            if frame is not None:
+                break
+
+            # hand over to the next item, without waiting for a frame in between
+            self._advance()
+            if self._last_frames is not None and self._crossfade > 0:
+                self._fade_frames = self._last_frames
+                self._fade_start_time = time.perf_counter()
+        else:
+            return None
+
+        if self._item_start_time is None:
+            self._item_start_time = time.perf_counter()
+            self._still_time = self._item_start_time
+
+        if getattr(self._player, "prepared", False):
+            frames = list(frame)
+        else:
+            frames = [self._processFrame(streamer, frame) for streamer in self._streamers]
+            # return the frame buffer to the pool
+            if hasattr(self._player, "release"):
+                self._player.release(frame)
+
+        self._current_frames = frames
+        if self._fade_frames is not None:
+            frames = self._fade(frames)
+        self._last_frames = frames
+
+        return frames
+
+    def stop(self) -> None:
+        if self._next_thread is not None:
+            self._next_thread.join()
+        for player in [self._player, self._next_player]:
+            if player is not None:
+                player.stop()
+        self._player = None
+        self._next_player = None
+
+    def _processFrame(self, streamer: WLEDStreamer, frame: np.ndarray) -> np.ndarray:
+        frame = streamer.cropFrame(frame)
+        frame = streamer.scaleFrame(frame)
+        return streamer.gammaCorrectFrame(frame)
+
+    def _waitStill(self, duration: float) -> Optional[List[np.ndarray]]:
+        """
+        A still image does not change, so it is only sent again to keep WLED in realtime
+        mode, or while fading to it. Returns None once the item has played for duration.
+        """
+        now = time.perf_counter()
+        if self._fade_frames is not None:
+            next_time = now + 1 / self._fps
+        else:
+            next_time = max(self._still_time + self._player.KEEPALIVE_INTERVAL, now)
+
+        if duration and self._item_start_time + duration <= next_time:
+            time.sleep(max(self._item_start_time + duration - now, 0))
+            return None
+
+        time.sleep(next_time - now)
+        self._still_time = next_time
+        return self._current_frames
+
+    def _fade(self, frames: List[np.ndarray]) -> List[np.ndarray]:
+        progress = (time.perf_counter() - self._fade_start_time) / self._crossfade
+        if progress >= 1:
+            self._fade_frames = None
+            return frames
+
+        return [
+            cv2.addWeighted(fade_frame, 1 - progress, frame, progress, 0)
+            if frame is not None
+            and fade_frame is not None
+            and fade_frame.shape == frame.shape
+            else frame
+            for fade_frame, frame in zip(self._fade_frames, frames)
+        ]
+
+    def _advance(self) -> None:
+        if self._player is not None:
+            self._player.stop()
+        self._player = None
+
+        if self._next_thread is None:
+            return
+        if self._next_thread.is_alive() and self._index >= 0:
+            self.logger.warning("Next item is not opened yet; waiting for it")
+        self._next_thread.join()
+        self._next_thread = None
+
+        self._player = self._next_player
+        self._index = self._next_index
+        self._next_player = None
+        self._item_start_time = None
+        self._current_frames = None
+        if self._player is None:
+            return
+
+        # the next item has buffered frames while waiting; play them at their own rate
+        self._pacer = None
+        framerate = getattr(self._player, "framerate", 0)
+        if framerate and not getattr(self._player, "prepared", False):
+            self._pacer = FramePacer(framerate)
+
+        self.logger.info(
+            "Playing item %d: %s"
+            % (self._index + 1, self._items[self._index].get("source", ""))
+        )
+        next_index = self._followingIndex(self._index)
+        if next_index is not None:
+            self._openNext(next_index)
+
+    def _followingIndex(self, index: int) -> Optional[int]:
+        if index + 1 < len(self._items):
+            return index + 1
+        if self._loop == 0:
+            return None
+        if self._loop > 0:
+            self._loop -= 1
+        return 0
+
+    def _openNext(self, index: int) -> None:
+        self._next_index = index
+        self._next_player = None
+        self._next_thread = threading.Thread(
+            target=self._open, args=(index,), name="PlaylistOpen"
+        )
+        self._next_thread.daemon = True
+        self._next_thread.start()
+
+    def _open(self, index: int) -> None:
+        # skip items that can not be opened, but give up if none of them can
+        for _ in range(len(self._items)):
+            item = self._items[index]
+            settings = {"fps": self._fps}
+            settings.update(
+                {key: value for key, value in item.items() if key in PLAYER_SETTINGS}
+            )
+            try:
+                self._next_player = createPlayer(streamers=self._streamers, **settings)
+                self._next_index = index
+                return
+            except Exception as exception:
+                self.logger.error(
+                    "Could not open item %d: %s (%s)"
+                    % (index + 1, item.get("source", ""), exception)
+                )
+
+            index = self._followingIndex(index)
+            if index is None:
+                return
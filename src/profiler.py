@@ -0,0 +1,105 @@
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+
+from typing import Any, Dict
+
+from .metrics import metrics
+from .utils import logger_handler
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stacks of all threads for a while, and writes them to a file in the
+    collapsed stack format used by flamegraph tools. The stage timings of the metrics are
+    collected while sampling. Nothing runs until profiling is started, eg by a signal.
+    """
+
+    INTERVAL = 0.005  # seconds between samples
+    TOP_FUNCTIONS = 10
+
+    def __init__(self, duration: float = 10, directory: str = ".") -> None:
+        self.logger = logging.getLogger("Profiler")
+        self.logger.propagate = False
+        self.logger.addHandler(logger_handler())
+        self.logger.setLevel(logging.DEBUG)
+
+        self.duration = duration
+        self.directory = directory
+
+        self._thread = None  # type: threading.Thread
+        self._labels = {}  # type: Dict[Any, str]
+
+    def installSignalHandler(self) -> bool:
+        """Starts profiling on SIGUSR1, where it exists"""
+        if not hasattr(signal, "SIGUSR1"):
+            return False
+        signal.signal(signal.SIGUSR1, lambda signum, frame: self.start())
+        return True
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="Profiler")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self) -> None:
+        self.logger.info("Profiling for %gs..." % self.duration)
+
+        # collect the stage timings separately, so --stats reports are not affected
+        metrics.openWindow()
+
+        stacks = {}  # type: Dict[str, int]
+        functions = {}  # type: Dict[str, int]
+        sample_count = 0
+        own_ident = threading.get_ident()
+        end_time = time.perf_counter() + self.duration
+        while time.perf_counter() < end_time:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                if not labels:
+                    continue
+                labels.append(names.get(ident, "thread %d" % ident))
+                stack = ";".join(reversed(labels))
+                stacks[stack] = stacks.get(stack, 0) + 1
+                function = "%s: %s" % (labels[-1], labels[0])
+                functions[function] = functions.get(function, 0) + 1
+            sample_count += 1
+            time.sleep(self.INTERVAL)
+
+        filename = os.path.join(
+            self.directory, "wledvideo-%s.folded" % time.strftime("%Y%m%d-%H%M%S")
+        )
+        with open(filename, "w") as profile_file:
+            for stack, count in sorted(stacks.items()):
+                profile_file.write("%s %d\n" % (stack, count))
+        self.logger.info("Wrote %d samples to %s" % (sample_count, filename))
+
+        # the share of samples each thread spent in a function, including waiting
+        self.logger.info("Most sampled functions:")
+        for label, count in sorted(functions.items(), key=lambda item: -item[1])[
+            : self.TOP_FUNCTIONS
+        ]:
+            self.logger.info("%5.1f%% %s" % (count / max(sample_count, 1) * 100, label))
+
+        self.logger.info("Stages while profiling:")
+        for line in metrics.closeWindow():
+            self.logger.info(line)
+
+    def _label(self, code) -> str:
+        try:
+            return self._labels[code]
+        except KeyError:
+            label = "%s:%s" % (os.path.basename(code.co_filename), code.co_name)
+            self._labels[code] = label
+            return label
@@ -0,0 +1,150 @@
+import logging
+import time
+
+from typing import Dict, List
+
+from .utils import logger_handler
+from .wledstreamer import WLEDStreamer
+
+
+class QualityController:
+    # steps taken in order when the pipeline can not keep up with the source
+    LEVELS = [
+        "full quality",
+        "nearest neighbour scaling",
+        "half frame rate",
+        "lower decode resolution",
+    ]
+
+    SMOOTHING = 0.1  # weight of a new sample in the moving average of the load
+    DEGRADE_LOAD = 0.9  # fraction of the frame budget above which quality is lowered
+    RESTORE_LOAD = 0.5  # fraction of the frame budget below which quality is restored
+    DEGRADE_DELAY = 1.0  # seconds to wait after a change before lowering quality
+    RESTORE_DELAY = 5.0  # seconds to wait after a change before restoring quality
+    MAX_RESTORE_DELAY = 60.0
+
+    DECODE_SCALE = 0.5
+
+    def __init__(
+        self, player, streamers: List[WLEDStreamer], framerate: float = 0
+    ) -> None:
+        self.logger = logging.getLogger("QualityController")
+        self.logger.propagate = False
+        self.logger.addHandler(logger_handler())
+        self.logger.setLevel(logging.DEBUG)
+
+        self._player = player
+        self._streamers = streamers
+        self._interpolations = [streamer.interpolation for streamer in streamers]
+
+        if not framerate:
+            framerate = getattr(player, "framerate", 0) or 30
+        self._frame_budget = 1 / framerate
+
+        self._level = 0
+        self._max_level = len(self.LEVELS) - 1
+        self._load = 0.0
+        self._frame_count = 0
+        self._level_start_time = time.perf_counter()
+        self._restore_time = 0.0
+        self._restore_delay = self.RESTORE_DELAY
+
+        self.logger.debug(
+            "Frame budget is %.1fms (%.1f fps)" % (self._frame_budget * 1000, framerate)
+        )
+
+    @property
+    def level(self) -> int:
+        return self._level
+
+    def shouldProcess(self) -> bool:
+        self._frame_count += 1
+        return self._level < 2 or self._frame_count % 2 == 0
+
+    def reset(self) -> None:
+        """
+        Restores full quality, so a controller that replaces this one does not take the
+        lowered quality as the settings of the streamers.
+        """
+        if self._level >= 1:
+            for streamer, interpolation in zip(self._streamers, self._interpolations):
+                streamer.setInterpolation(interpolation)
+        if self._level >= 3:
+            self._player.setResolutionScale(1.0)
+        self._level = 0
+        self._level_start_time = time.perf_counter()
+
+    def update(self, stage_times: Dict[str, float]) -> None:
+        # frames are skipped at half frame rate, so there is twice the time for the rest
+        budget = self._frame_budget * (2 if self._level >= 2 else 1)
+        decode_time = getattr(self._player, "decode_time", 0.0)
+        load = max(sum(stage_times.values()) / budget, decode_time / self._frame_budget)
+        self._load += self.SMOOTHING * (load - self._load)
+
+        now = time.perf_counter()
+        elapsed_time = now - self._level_start_time
+        if (
+            self._load > self.DEGRADE_LOAD
+            and elapsed_time > self.DEGRADE_DELAY
+            and self._level < self._max_level
+        ):
+            # back off if restoring quality was premature
+            if now - self._restore_time < self._restore_delay:
+                self._restore_delay = min(
+                    self._restore_delay * 2, self.MAX_RESTORE_DELAY
+                )
+            self._changeLevel(self._level + 1, stage_times, decode_time)
+
+        elif (
+            self._load < self.RESTORE_LOAD
+            and elapsed_time > self._restore_delay
+            and self._level > 0
+        ):
+            self._restore_time = now
+            self._changeLevel(self._level - 1, stage_times, decode_time)
+
+    def _changeLevel(
+        self, level: int, stage_times: Dict[str, float], decode_time: float
+    ) -> None:
+        if level >= 3 and self._level < 3:
+            set_resolution_scale = getattr(self._player, "setResolutionScale", None)
+            if set_resolution_scale is None or not set_resolution_scale(
+                self.DECODE_SCALE
+            ):
+                self.logger.warning(
+                    "The decode resolution can not be lowered for this source"
+                )
+                self._max_level = 2
+                return
+            for streamer in self._streamers:
+                streamer.crop_reference_size = self._player.native_size
+
+        timings = ", ".join(
+            "%s %.1fms" % (stage, stage_time * 1000)
+            for stage, stage_time in list(stage_times.items())
+            + [("decode", decode_time)]
+        )
+        self.logger.info(
+            "%s quality to '%s': load is %d%% of the frame budget (%s)"
+            % (
+                "Lowering" if level > self._level else "Restoring",
+                self.LEVELS[level],
+                self._load * 100,
+                timings,
+            )
+        )
+
+        if level >= 1 and self._level < 1:
+            for streamer in self._streamers:
+                streamer.setInterpolation("hard")
+        elif level < 1 and self._level >= 1:
+            for streamer, interpolation in zip(
+                self._streamers, self._interpolations
+            ):
+                streamer.setInterpolation(interpolation)
+
+        if level < 3 and self._level >= 3:
+            self._player.setResolutionScale(1.0)
+
+        self._level = level
+        self._level_start_time = time.perf_counter()
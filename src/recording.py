@@ -0,0 +1,237 @@
+import numpy as np
+
+import array
+import logging
+import struct
+import time
+
+from typing import Iterator, List, Tuple
+
+from .utils import logger_handler
+
+# File layout:
+#   header:  magic, number of devices, (width, height) for each device
+#   records: timestamp, device index, width * height * 3 bytes of pixel data
+#   footer:  offset of each record, offset of the index, number of records, index magic
+# The footer is written when the recording is closed. If it is missing (eg because
+# the process was killed), the index is rebuilt by scanning the records.
+
+MAGIC = b"WLEDREC1"
+INDEX_MAGIC = b"WLEDIDX1"
+
+HEADER = struct.Struct("<8sH")
+DEVICE = struct.Struct("<HH")
+RECORD = struct.Struct("<dH")
+FOOTER = struct.Struct("<QQ8s")
+
+
+class RecordingWriter:
+    def __init__(self, filename: str, dimensions: List[Tuple[int, int]]) -> None:
+        self.logger = logging.getLogger("RecordingWriter")
+        self.logger.propagate = False
+        self.logger.addHandler(logger_handler())
+        self.logger.setLevel(logging.DEBUG)
+
+        self._dimensions = dimensions
+        self._file = open(filename, "wb")
+        self._file.write(HEADER.pack(MAGIC, len(dimensions)))
+        for width, height in dimensions:
+            self._file.write(DEVICE.pack(width, height))
+        self._offset = HEADER.size + DEVICE.size * len(dimensions)
+
+        self._index = array.array("Q")
+        self._start_time = None
+
+        self.logger.info("Recording to %s" % filename)
+
+    def write(self, device: int, frame: np.ndarray, timestamp: float = None) -> None:
+        if timestamp is None:
+            now = time.perf_counter()
+            if self._start_time is None:
+                self._start_time = now
+            timestamp = now - self._start_time
+
+        if device >= len(self._dimensions):
+            return
+        width, height = self._dimensions[device]
+        if frame.shape[:2] != (height, width):
+            self.logger.warning(
+                "Frame for device %d does not match the recorded dimensions" % device
+            )
+            return
+
+        self._index.append(self._offset)
+        self._file.write(RECORD.pack(timestamp, device))
+        self._file.write(np.ascontiguousarray(frame, np.uint8).data)
+        self._offset += RECORD.size + width * height * 3
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+
+        self._index.tofile(self._file)
+        self._file.write(FOOTER.pack(self._offset, len(self._index), INDEX_MAGIC))
+        self._file.close()
+
+        self.logger.info("Recorded %d frames" % len(self._index))
+
+
+class RecordingReader:
+    def __init__(self, filename: str) -> None:
+        self.logger = logging.getLogger("RecordingReader")
+        self.logger.propagate = False
+        self.logger.addHandler(logger_handler())
+        self.logger.setLevel(logging.DEBUG)
+
+        self._file = open(filename, "rb")
+
+        magic, device_count = HEADER.unpack(self._file.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError("%s is not a wledvideo recording" % filename)
+
+        self.dimensions = [
+            DEVICE.unpack(self._file.read(DEVICE.size)) for _ in range(device_count)
+        ]
+        self._data_start = HEADER.size + DEVICE.size * device_count
+
+        self._index = self._readIndex()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __getitem__(self, position: int) -> Tuple[float, int, np.ndarray]:
+        self._file.seek(self._index[position])
+        timestamp, device = RECORD.unpack(self._file.read(RECORD.size))
+
+        width, height = self.dimensions[device]
+        data = self._file.read(width * height * 3)
+        frame = np.frombuffer(data, np.uint8).reshape((height, width, 3))
+
+        return timestamp, device, frame
+
+    def deviceAt(self, position: int) -> int:
+        """Returns the device of a record, without reading its frame"""
+        self._file.seek(self._index[position])
+        return RECORD.unpack(self._file.read(RECORD.size))[1]
+
+    def __iter__(self) -> Iterator[Tuple[float, int, np.ndarray]]:
+        for position in range(len(self._index)):
+            yield self[position]
+
+    @property
+    def duration(self) -> float:
+        if not self._index:
+            return 0.0
+        return self[len(self._index) - 1][0]
+
+    def close(self) -> None:
+        self._file.close()
+
+    def _readIndex(self) -> array.array:
+        index = array.array("Q")
+
+        file_size = self._file.seek(0, 2)
+        if file_size >= self._data_start + FOOTER.size:
+            self._file.seek(file_size - FOOTER.size)
+            index_offset, count, magic = FOOTER.unpack(self._file.read(FOOTER.size))
+            if magic == INDEX_MAGIC:
+                self._file.seek(index_offset)
+                index.fromfile(self._file, count)
+                return index
+
+        self.logger.warning("Recording has no index, probably incomplete. Rebuilding index...")
+
+        offset = self._data_start
+        while offset + RECORD.size <= file_size:
+            self._file.seek(offset)
+            _, device = RECORD.unpack(self._file.read(RECORD.size))
+            if device >= len(self.dimensions):
+                break
+            width, height = self.dimensions[device]
+            record_size = RECORD.size + width * height * 3
+            if offset + record_size > file_size:
+                break
+            index.append(offset)
+            offset += record_size
+
+        return index
+
+
+class RecordingPlayer:
+    # frames returned by read() have already been processed for each streamer
+    prepared = True
+
+    def __init__(
+        self,
+        reader: RecordingReader,
+        loop: int = 0,
+        fast: bool = False,
+        device_count: int = 0,
+    ) -> None:
+        self.logger = logging.getLogger("RecordingPlayer")
+        self.logger.propagate = False
+        self.logger.addHandler(logger_handler())
+        self.logger.setLevel(logging.DEBUG)
+
+        if device_count and device_count != len(reader.dimensions):
+            self.logger.warning(
+                "Recording contains %d devices, but %d are configured"
+                % (len(reader.dimensions), device_count)
+            )
+
+        self._reader = reader
+        self._loop = loop
+        self._fast = fast
+
+        self._position = 0
+        self._frame_count = 0
+        self._start_time = None
+        self._loop_start_time = None
+
+    def read(self) -> List[np.ndarray]:
+        if self._position >= len(self._reader):
+            if self._loop == 0 or len(self._reader) == 0:
+                return None
+            if self._loop > 0:
+                self._loop -= 1
+            self._position = 0
+            self._loop_start_time = None
+
+        # the records of one send pass are stored in the order of the devices; they are
+        # returned together, so they can be pushed (and synchronised) at once
+        frames = [None] * len(self._reader.dimensions)
+        timestamp, device, frames[device] = self._reader[self._position]
+        self._position += 1
+        while self._position < len(self._reader):
+            next_device = self._reader.deviceAt(self._position)
+            if next_device <= device:
+                break
+            _, device, frames[device] = self._reader[self._position]
+            self._position += 1
+
+        now = time.perf_counter()
+        if self._start_time is None:
+            self._start_time = now
+        if self._loop_start_time is None:
+            self._loop_start_time = now - timestamp
+        if not self._fast:
+            delay = self._loop_start_time + timestamp - now
+            if delay > 0:
+                time.sleep(delay)
+
+        self._frame_count += 1
+
+        return frames
+
+    def stop(self) -> None:
+        if self._start_time is not None:
+            elapsed_time = time.perf_counter() - self._start_time
+            self.logger.info(
+                "Replayed %d frames in %.2fs (%.1f frames per second)"
+                % (
+                    self._frame_count,
+                    elapsed_time,
+                    self._frame_count / max(elapsed_time, 1e-6),
+                )
+            )
+        self._reader.close()
@@ -28,7 +28,8 @@ class SerialWLEDStreamer(WLEDStreamer):
     def close(self):
         self._serial_device.close()
 
-    def sendFrame(self, frame: np.ndarray) -> None:
+    def sendFrame(self, frame: np.ndarray, push: bool = True) -> None:
+        # tpm2 has no separate push; the frame is displayed as soon as it is received
         frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         frame = frame.flatten().astype("int8").tobytes()
 
@@ -4,15 +4,20 @@ import numpy as np
 import socket
 import requests
 import json
+import math
 import struct
 
-from typing import List
+from typing import List, Optional, Tuple, Union
 
+from .metrics import metrics
+from .packettuner import PacketTuner, fragmentCount, maxPacketPixels, probePathMTU
 from .wledstreamer import WLEDStreamer
 
 
 class UDPWLEDStreamer(WLEDStreamer):
     MAX_PIXELS_PER_DATAGRAM = 480
+    # the largest packet that fits in a UDP datagram
+    MAX_PACKET_PIXELS = (65507 - 10) // 3
 
     VER1 = 0x40  # version=1
     PUSH = 0x01
@@ -30,6 +35,7 @@ class UDPWLEDStreamer(WLEDStreamer):
         scale: str = "fill",
         interpolation: str = "smooth",
         gamma: float = 0.5,
+        packet_pixels: Union[int, str] = MAX_PIXELS_PER_DATAGRAM,
     ) -> None:
         self._ip = socket.gethostbyname(host)
         self._port = port
@@ -37,19 +43,78 @@ class UDPWLEDStreamer(WLEDStreamer):
 
         self._sequenceNumber = 0
 
+        # a packet without data, telling WLED to display the data it has received
+        self._push_message = self.pushMessage()
+
         WLEDStreamer.__init__(self, width, height, crop, scale, interpolation, gamma)
 
+        name = "%s:%d" % (self._ip, self._port)
+        self._mtu = probePathMTU(self._ip, self._port)
+        self._tuner = None  # type: Optional[PacketTuner]
+        if packet_pixels == "auto":
+            self._tuner = PacketTuner(
+                name,
+                PacketTuner.candidatesFor(self._mtu, self.width * self.height),
+                self._queryFps,
+            )
+            self._packet_pixels = self._tuner.packet_pixels
+        else:
+            self._packet_pixels = min(int(packet_pixels), self.MAX_PACKET_PIXELS)
+            if self._packet_pixels > maxPacketPixels(self._mtu):
+                self.logger.warning(
+                    "Packets of %d pixels to %s are fragmented (MTU %d)"
+                    % (self._packet_pixels, name, self._mtu)
+                )
+
+        self._packets_metric = "%s packets" % name
+        self._fragments_metric = "%s fragments" % name
+        self._bytes_metric = "%s bytes" % name
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._ip, self._port
+
     def close(self):
+        if self._tuner:
+            self._tuner.stop()
         self._socket.close()
 
-    def sendFrame(self, frame: np.ndarray) -> None:
+    @classmethod
+    def pushMessage(cls) -> bytes:
+        return struct.pack(
+            "!BBBBLH",
+            cls.VER1 | cls.PUSH,
+            0,
+            ((cls.RGBTYPE << 3) & 0xff) | cls.PIXEL24,
+            cls.SOURCE,
+            0,
+            0,
+        )
+
+    @property
+    def port(self) -> int:
+        return self._port
+
+    @property
+    def packet_pixels(self) -> int:
+        return self._packet_pixels
+
+    def push(self) -> None:
+        self._socket.sendto(self._push_message, (self._ip, self._port))
+
+    def sendFrame(self, frame: np.ndarray, push: bool = True) -> None:
+        if self._tuner:
+            self._tuner.start()
+            self._packet_pixels = self._tuner.packet_pixels
+        packet_pixels = self._packet_pixels
+
         frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         frame = frame.flatten()
 
-        for start in range(0, int(frame.size / 3), self.MAX_PIXELS_PER_DATAGRAM):
-            data = frame[(start * 3) : (start + self.MAX_PIXELS_PER_DATAGRAM) * 3]
+        for start in range(0, int(frame.size / 3), packet_pixels):
+            data = frame[(start * 3) : (start + packet_pixels) * 3]
 
-            push_bit = self.PUSH if (start + self.MAX_PIXELS_PER_DATAGRAM >= int(frame.size / 3)) else 0
+            push_bit = self.PUSH if (push and start + packet_pixels >= int(frame.size / 3)) else 0
             bytes_start = start * 3
             bytes_length = len(data)
 
@@ -74,6 +139,24 @@ class UDPWLEDStreamer(WLEDStreamer):
             if self._sequenceNumber > 15:
                 self._sequenceNumber = 0
 
+        if metrics.collecting:
+            packets = math.ceil(frame.size / 3 / packet_pixels)
+            last_length = frame.size - (packets - 1) * packet_pixels * 3
+            metrics.count(self._packets_metric, packets)
+            metrics.count(
+                self._fragments_metric,
+                (packets - 1) * fragmentCount(packet_pixels * 3, self._mtu)
+                + fragmentCount(last_length, self._mtu),
+            )
+            metrics.count(self._bytes_metric, frame.size + packets * 10)
+
+    def _queryFps(self) -> Optional[float]:
+        try:
+            self._loadInfo()
+            return float(self._wled_info["leds"]["fps"])
+        except Exception:
+            return None
+
     def _loadInfo(self) -> None:
         response = requests.get("http://" + self._ip + "/json/info", timeout=5)
         self._wled_info = json.loads(response.text)
@@ -1,6 +1,8 @@
 import logging
 from colorlog import ColoredFormatter
 
+from typing import List, Union
+
 
 def logger_handler():
     """'
@@ -29,3 +31,49 @@ def logger_handler():
 
     handler.setFormatter(formatter)
     return handler
+
+
+def cropArgument(argument: Union[str, List[int]]) -> List[int]:
+    """
+    ## cropArgument
+
+    Parses crop amounts from a comma separated string or a list. Either 1, 2 or 4 values can
+    be specified, for cropping all sides by the same amount, different amounts horizontally
+    and vertically, or all sides individually.
+
+    **Returns:** A list of 4 crop amounts (left, top, right, bottom), or an empty list
+    """
+    if isinstance(argument, List):
+        crop_amounts = [int(a) for a in argument]
+    else:
+        crop_amounts = [int(a) for a in argument.split(",")]
+
+    if len(crop_amounts) == 1:
+        crop_amounts = crop_amounts * 4
+    elif len(crop_amounts) == 2:
+        crop_amounts = crop_amounts * 2
+    elif len(crop_amounts) in [0, 4]:
+        pass
+    else:
+        raise ValueError
+
+    return crop_amounts
+
+
+def packetPixelsArgument(argument: Union[str, int]) -> Union[str, int]:
+    """
+    ## packetPixelsArgument
+
+    Parses the number of pixels to send in each DDP packet, or 'auto' to tune it while
+    streaming.
+
+    **Returns:** A positive number of pixels, or 'auto'
+    """
+    if str(argument).lower() == "auto":
+        return "auto"
+
+    packet_pixels = int(argument)
+    if packet_pixels <= 0:
+        raise ValueError
+
+    return packet_pixels
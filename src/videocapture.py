@@ -0,0 +1,47 @@
+import logging
+
+from typing import Union
+
+from . import loopablecamgear
+from .utils import logger_handler
+
+
+class VideoCapture(loopablecamgear.LoopableCamGear):
+    def __init__(
+        self,
+        source: Union[str, int],
+        loop: int = 0,
+        start: float = 0,
+        end: float = 0,
+    ) -> None:
+        stream_mode = False
+        options = {}
+        if type(source) != int and "://" in source:
+            stream_mode = True
+            options = {"STREAM_RESOLUTION": "360p"}
+
+        self.logger = logging.getLogger("VideoCapture")
+        self.logger.propagate = False
+        self.logger.addHandler(logger_handler())
+        self.logger.setLevel(logging.DEBUG)
+
+        try:
+            super().__init__(
+                source=source,
+                stream_mode=stream_mode,
+                logging=True,
+                loop=loop,
+                start=start,
+                end=end,
+                **options
+            )
+        except ValueError:
+            self.logger.info("Source is not an URL that yt_dlp can handle.")
+            super().__init__(
+                source=source,
+                logging=True,
+                loop=loop,
+                start=start,
+                end=end,
+            )
+        self.start()
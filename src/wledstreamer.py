@@ -3,7 +3,6 @@ import numpy as np
 
 import math
 import logging
-import sys
 
 from typing import List
 
@@ -34,32 +33,86 @@ class WLEDStreamer:
             self.width, self.height = self._getDimensions()
             self.logger.debug("width: %d, height: %d" % (self.width, self.height))
             if self.width == 0 or self.height == 0:
-                self.logger.error(
+                raise RuntimeError(
                     "Could not get width and/or height from wled instance."
                 )
-                sys.exit()
         self._display_ratio = self.width / self.height
 
         self.crop = crop
         self.scale = scale
 
+        # frame size the crop amounts are specified for. If set, the crop amounts are
+        # scaled for frames of a different size (eg when decoding at a lower resolution)
+        self.crop_reference_size = None
+
+        self.setGamma(gamma)
+        self.setInterpolation(interpolation)
+
+    def close(self):
+        pass
+
+    def configure(
+        self,
+        width: int = 0,
+        height: int = 0,
+        crop: List[int] = None,
+        scale: str = None,
+        interpolation: str = None,
+        gamma: float = None,
+    ) -> bool:
+        changed = False
+
+        if width and height and (width, height) != (self.width, self.height):
+            self.width = width
+            self.height = height
+            self._display_ratio = self.width / self.height
+            changed = True
+        if crop is not None and list(crop) != list(self.crop):
+            self.crop = crop
+            changed = True
+        if scale is not None and scale != self.scale:
+            self.scale = scale
+            changed = True
+        if interpolation is not None and interpolation != self.interpolation:
+            self.setInterpolation(interpolation)
+            changed = True
+        if gamma is not None and gamma != self.gamma:
+            self.setGamma(gamma)
+            changed = True
+
+        return changed
+
+    def setGamma(self, gamma: float) -> None:
         inverseGamma = 1 / gamma
-        self._gamma_table = [((i / 255) ** inverseGamma) * 255 for i in range(256)]
-        self._gamma_table = np.array(self._gamma_table, np.uint8)
+        gamma_table = [((i / 255) ** inverseGamma) * 255 for i in range(256)]
+        self._gamma_table = np.array(gamma_table, np.uint8)
+        self.gamma = gamma
 
+    def setInterpolation(self, interpolation: str) -> None:
+        self.interpolation = interpolation
         self._interpolation = (
             cv2.INTER_NEAREST if interpolation == "hard" else cv2.INTER_AREA
         )
 
-    def close(self):
-        pass
-
     def cropFrame(self, frame: np.ndarray) -> np.ndarray:
         if self.crop:
             frame_height, frame_width = frame.shape[:2]
+            crop = self.crop
+            if self.crop_reference_size and self.crop_reference_size != (
+                frame_width,
+                frame_height,
+            ):
+                scale_x = frame_width / self.crop_reference_size[0]
+                scale_y = frame_height / self.crop_reference_size[1]
+                crop = [
+                    round(crop[0] * scale_x),
+                    round(crop[1] * scale_y),
+                    round(crop[2] * scale_x),
+                    round(crop[3] * scale_y),
+                ]
             frame = frame[
-                self.crop[1] : frame_height - self.crop[3],
-                self.crop[0] : frame_width - self.crop[2],
+                crop[1] : frame_height - crop[3],
+                crop[0] : frame_width - crop[2],
             ]
 
         return frame
@@ -105,9 +158,12 @@ class WLEDStreamer:
     def gammaCorrectFrame(self, frame: np.ndarray) -> np.ndarray:
         return cv2.LUT(frame, self._gamma_table)
 
-    def sendFrame(self, frame: np.ndarray) -> None:
+    def sendFrame(self, frame: np.ndarray, push: bool = True) -> None:
         self.logger.warning("Sending should be handled by a subclass of this class.")
 
+    def push(self) -> None:
+        pass
+
     def _loadInfo(self) -> None:
         pass
 
@@ -1,59 +1,62 @@
 #!/usr/bin/python3
 
+import os
 import sys
 import argparse
 import toml
-import logging
-import cv2
 
-import src.displaycapture as displaycapture
-import src.loopablecamgear as loopablecamgear
-import src.udpstreamer as udpstreamer
-import src.serialstreamer as serialstreamer
-
-from src.utils import logger_handler
+import src.chunkedrender as chunkedrender
+import src.compositor as compositor
+import src.recording as recording
+import src.qualitycontroller as qualitycontroller
+import src.daemon as daemon
+import src.framesync as framesync
+import src.interpolator as interpolator
+import src.playlist as playlist
+import src.profiler as profiler
+
+from src.imagesource import isImageSource
+from src.metrics import metrics
+from src.pipeline import (
+    COMPOSITION_SETTINGS,
+    INTERPOLATION_MODES,
+    SCALE_MODES,
+    Pipeline,
+    createPlayer,
+    createStreamer,
+    streamerConfig,
+)
+from src.utils import cropArgument, packetPixelsArgument
+from src.wledstreamer import WLEDStreamer
 
 from typing import Union, List
 
 
-class VideoCapture(loopablecamgear.LoopableCamGear):
-    def __init__(self, source: Union[str, int], loop: bool = False) -> None:
-        stream_mode = False
-        options = {}
-        if type(source) != int and "://" in source:
-            stream_mode = True
-            options = {"STREAM_RESOLUTION": "360p"}
-
-        self.logger = logging.getLogger("VideoCapture")
-        self.logger.propagate = False
-        self.logger.addHandler(logger_handler())
-        self.logger.setLevel(logging.DEBUG)
-
-        try:
-            super().__init__(
-                source=source,
-                stream_mode=stream_mode,
-                logging=True,
-                loop=loop,
-                **options
-            )
-        except ValueError:
-            self.logger.info("Source is not an URL that yt_dlp can handle.")
-            super().__init__(
-                source=source,
-                logging=True,
-                loop=loop,
-            )
-        self.start()
-
-
 if __name__ == "__main__":
     DEFAULT_CONFIG_FILE = "config.toml"
     CONFIG_DEFAULTS = {
         "source": "" if "--camera" not in sys.argv else 0,
         "loop": 0,
+        "start": 0,
+        "end": 0,
+        "crossfade": 0,
         "camera": False,
         "display": False,
+        "fps": 30,
+        "output_fps": 0,
+        "output_interpolation": "crossfade",
+        "replay": "",
+        "replay_fast": False,
+        "record": "",
+        "render": "",
+        "workers": 0,
+        "adaptive": False,
+        "stats": False,
+        "profile_duration": 10,
+        "sync": "",
+        "broadcast_address": "255.255.255.255",
+        "daemon": False,
+        "control_port": 4049,
         "debug": False,
     }
     STREAMER_CONFIG_DEFAULTS = {
@@ -67,6 +70,7 @@ if __name__ == "__main__":
         "scale": "fill",
         "interpolation": "smooth",
         "gamma": 0.5,
+        "packet_pixels": 480,
     }
 
     parser = argparse.ArgumentParser()
@@ -101,24 +105,6 @@ if __name__ == "__main__":
     # parse the rest of the arguments
     #
 
-    # utility method to parse crop arguments
-    def cropArgument(argument: str) -> List[int]:
-        if isinstance(argument, List):
-            crop_amounts = [int(a) for a in argument]
-        else:
-            crop_amounts = [int(a) for a in argument.split(",")]
-
-        if len(crop_amounts) == 1:
-            crop_amounts = crop_amounts * 4
-        elif len(crop_amounts) == 2:
-            crop_amounts = crop_amounts * 2
-        elif len(crop_amounts) in [0, 4]:
-            pass
-        else:
-            raise ValueError
-
-        return crop_amounts
-
     # get default from config file or from defaults
     def getDefault(key: str) -> Union[str, int, float, bool, List[int]]:
         return config[key] if key in config else CONFIG_DEFAULTS[key]
@@ -166,13 +152,13 @@ if __name__ == "__main__":
     )
     parser.add_argument(
         "--scale",
-        choices=["stretch", "fill", "fit", "crop"],
+        choices=SCALE_MODES,
         default=getStreamerDefault("scale"),
         help="'stretch' stretches the video to the panel, disregarding aspect ratio, 'fill' scales the video so the whole panel is covered (default), 'fit' scales the whole video onto the panel adding black bars, 'crop' shows only the center of the video at 100%%",
     )
     parser.add_argument(
         "--interpolation",
-        choices=["hard", "smooth"],
+        choices=INTERPOLATION_MODES,
         default=getStreamerDefault("interpolation"),
         help="'smooth' uses pixel area relation when scaling the video (default), 'hard' uses nearest neighbour algorithm leading to crisper edges",
     )
@@ -182,14 +168,28 @@ if __name__ == "__main__":
         default=getStreamerDefault("gamma"),
         help="adjust for non-linearity of LEDs, defaults to 0.5",
     )
+    parser.add_argument(
+        "--packet-pixels",
+        type=packetPixelsArgument,
+        default=packetPixelsArgument(getStreamerDefault("packet_pixels")),
+        help="number of pixels to send in each DDP packet, defaults to 480. 'auto' picks the size at which WLED displays the most frames, without fragmenting packets",
+    )
 
-    if "--display" not in sys.argv:
+    if "--display" not in sys.argv and "--replay" not in sys.argv:
         parser.add_argument(
             "source",
-            nargs="?" if "source" in config or "--camera" in sys.argv else 1,
+            nargs="?"
+            if "source" in config
+            or "sources" in config
+            or "playlist" in config
+            or "replay" in config
+            or "--camera" in sys.argv
+            or "--daemon" in sys.argv
+            or config.get("daemon")
+            else 1,
             type=int if "--camera" in sys.argv else str,
             default=getDefault("source"),
-            help="The video file to stream (required unless a source is specified in the config file). If --camera is set, 'source' shall be the index of the camera source (defaulting to 0)",
+            help="The video file, image, GIF or directory of images to stream, or a ddp://host:port/WIDTHxHEIGHT address to relay DDP from (required unless a source, [[sources]] or a [[playlist]] are specified in the config file). If --camera is set, 'source' shall be the index of the camera source (defaulting to 0)",
         )
     parser.add_argument(
         "--loop",
@@ -197,7 +197,25 @@ if __name__ == "__main__":
         type=int,
         const=-1,
         default=getDefault("loop"),
-        help="loop the source n times (default: 0)",
+        help="loop the source (or the playlist) n times (default: 0)",
+    )
+    parser.add_argument(
+        "--start",
+        type=float,
+        default=getDefault("start"),
+        help="time in seconds to start playing (and looping) the video from",
+    )
+    parser.add_argument(
+        "--end",
+        type=float,
+        default=getDefault("end"),
+        help="time in seconds to stop playing (or loop) the video at",
+    )
+    parser.add_argument(
+        "--crossfade",
+        type=float,
+        default=getDefault("crossfade"),
+        help="time in seconds to fade from one item of a playlist to the next, defaults to 0",
     )
     source_group = parser.add_mutually_exclusive_group()
     source_group.add_argument(
@@ -212,6 +230,98 @@ if __name__ == "__main__":
         default=getDefault("display"),
         help="grab the desktop instead of a video",
     )
+    parser.add_argument(
+        "--fps",
+        type=float,
+        default=getDefault("fps"),
+        help="frame rate to grab the desktop or to play an image sequence at, defaults to 30",
+    )
+    parser.add_argument(
+        "--output-fps",
+        type=float,
+        default=getDefault("output_fps"),
+        help="frame rate to send to WLED at, synthesising frames in between the frames of the source. By default every frame of the source is sent once",
+    )
+    parser.add_argument(
+        "--output-interpolation",
+        choices=interpolator.FrameInterpolator.MODES,
+        default=getDefault("output_interpolation"),
+        help="'crossfade' blends consecutive frames of the source (default), 'flow' moves the pixels along the motion between them",
+    )
+    source_group.add_argument(
+        "--replay",
+        metavar="FILE",
+        default=getDefault("replay"),
+        help="stream a recording made with --record instead of a video",
+    )
+    parser.add_argument(
+        "--replay-fast",
+        action="store_true",
+        default=getDefault("replay_fast"),
+        help="replay the recording as fast as possible instead of with its original timing",
+    )
+    parser.add_argument(
+        "--record",
+        metavar="FILE",
+        default=getDefault("record"),
+        help="record the frames sent to each WLED instance to FILE",
+    )
+    parser.add_argument(
+        "--render",
+        metavar="FILE",
+        default=getDefault("render"),
+        help="process the whole video file for each WLED instance as fast as possible, using all CPU cores, into a recording that can be streamed with --replay",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=getDefault("workers"),
+        help="number of processes to use with --render, defaults to the number of CPU cores",
+    )
+
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        default=getDefault("adaptive"),
+        help="lower the quality when the source can not be streamed in real time",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        default=getDefault("stats"),
+        help="periodically log timing statistics while streaming",
+    )
+    parser.add_argument(
+        "--profile-duration",
+        type=float,
+        default=getDefault("profile_duration"),
+        help="time in seconds to profile for when receiving SIGUSR1, defaults to 10. The stacks of all threads are written to a wledvideo-<time>.folded file for flamegraph tools",
+    )
+
+    parser.add_argument(
+        "--sync",
+        choices=framesync.FrameSync.MODES,
+        default=getDefault("sync") or None,
+        help="make all WLED instances display each frame at the same time, by sending a 'burst' of push packets to each instance or a single 'broadcast' push packet",
+    )
+    parser.add_argument(
+        "--broadcast-address",
+        default=getDefault("broadcast_address"),
+        help="address to send the push packet to when using --sync broadcast, defaults to 255.255.255.255",
+    )
+
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        default=getDefault("daemon"),
+        help="keep running and accept commands over HTTP to play, stop and switch sources, change settings and reload the config file",
+    )
+    parser.add_argument(
+        "--control-port",
+        type=int,
+        default=getDefault("control_port"),
+        help="port to listen on for commands when running as a daemon, defaults to 4049",
+    )
 
     parser.add_argument(
         "--debug",
@@ -222,29 +332,41 @@ if __name__ == "__main__":
 
     args = parser.parse_args()
 
-    if not args.display and args.source:
+    if args.end and args.end <= args.start:
+        parser.error("--end must be after --start")
+
+    if not args.display and not args.replay and args.source:
         if isinstance(args.source, list):
             source = args.source[0]
         else:
             source = args.source
+    elif args.camera or args.display:
+        source = 0
     else:
-        if args.camera or args.display:
-            source = 0
+        source = ""
 
     config["wled"][0] = {
-        "width": args.width,
-        "height": args.height,
-        "crop": args.crop,
-        "scale": args.scale,
-        "interpolation": args.interpolation,
-        "gamma": args.gamma,
+        key: stream_config[key]
+        for key in COMPOSITION_SETTINGS
+        if key in stream_config
     }
+    config["wled"][0].update(
+        {
+            "width": args.width,
+            "height": args.height,
+            "crop": args.crop,
+            "scale": args.scale,
+            "interpolation": args.interpolation,
+            "gamma": args.gamma,
+        }
+    )
 
     if args.serial == "" and "serial" not in config["wled"][0]:
         config["wled"][0].update(
             {
                 "host": args.host,
                 "port": args.port,
+                "packet_pixels": args.packet_pixels,
             }
         )
     else:
@@ -255,44 +377,159 @@ if __name__ == "__main__":
             }
         )
 
-    wled_streamers = []
+    if args.replay:
+        reader = recording.RecordingReader(args.replay)
+
+        # use the recorded dimensions for streamers that don't specify any
+        for index, stream_config in enumerate(config["wled"]):
+            if index < len(reader.dimensions) and (
+                not stream_config.get("width") or not stream_config.get("height")
+            ):
+                stream_config["width"], stream_config["height"] = reader.dimensions[
+                    index
+                ]
+
+    group_configs = config["wled"]
+    config["wled"] = [streamerConfig(stream_config) for stream_config in config["wled"]]
+
+    if args.render:
+        if (
+            args.camera
+            or args.display
+            or not os.path.isfile(str(source))
+            or isImageSource(source)
+        ):
+            parser.error("--render needs a video file as the source")
+
+        # only the size and processing settings are needed; WLED is only asked for the
+        # size of groups that don't specify it
+        try:
+            render_streamers = [
+                WLEDStreamer(
+                    **{
+                        key: stream_config[key]
+                        for key in chunkedrender.PROCESS_SETTINGS
+                        if key in stream_config
+                    }
+                )
+                if stream_config.get("width") and stream_config.get("height")
+                else createStreamer(stream_config)
+                for stream_config in config["wled"]
+            ]
+        except RuntimeError as error:
+            sys.exit(str(error))
+        renderer = chunkedrender.ChunkedRenderer(
+            source, render_streamers, start=args.start, end=args.end, workers=args.workers
+        )
+        renderer.render(args.render)
+        for render_streamer in render_streamers:
+            render_streamer.close()
+        sys.exit(0)
 
-    for stream_config in config["wled"]:
-        if "serialport" in stream_config:
-            streamer = serialstreamer.SerialWLEDStreamer(**stream_config)
-        else:
-            streamer = udpstreamer.UDPWLEDStreamer(**stream_config)
-        wled_streamers.append(streamer)
+    try:
+        wled_streamers = [
+            createStreamer(stream_config) for stream_config in config["wled"]
+        ]
+    except RuntimeError as error:
+        sys.exit(str(error))
+
+    recorder = None
+    if args.record:
+        recorder = recording.RecordingWriter(
+            args.record,
+            [(streamer.width, streamer.height) for streamer in wled_streamers],
+        )
+
+    sync = None
+    if args.sync:
+        sync = framesync.FrameSync(args.sync, args.broadcast_address)
+
+    pipeline = Pipeline(
+        wled_streamers,
+        recorder=recorder,
+        sync=sync,
+        debug=args.debug,
+        output_fps=args.output_fps,
+        output_interpolation=args.output_interpolation,
+    )
 
-    if not args.display:
-        player = VideoCapture(source=source, loop=args.loop)
+    metrics.enabled = args.stats
+    profiler.SamplingProfiler(args.profile_duration).installSignalHandler()
+
+    if args.daemon:
+        wled_daemon = daemon.Daemon(
+            pipeline,
+            config["wled"],
+            config_file=args.config,
+            config=config,
+            adaptive=args.adaptive,
+            control_port=args.control_port,
+            fps=args.fps,
+        )
+        if args.display or args.camera or source != "":
+            wled_daemon.play(
+                source,
+                camera=args.camera,
+                display=args.display,
+                loop=args.loop,
+                start=args.start,
+                end=args.end,
+            )
+        wled_daemon.run()
+        pipeline.close()
+        metrics.report(force=True)
+        sys.exit(0)
+
+    if args.replay:
+        player = recording.RecordingPlayer(
+            reader,
+            loop=args.loop,
+            fast=args.replay_fast,
+            device_count=len(wled_streamers),
+        )
+    elif config.get("sources") and not (source != "" or args.camera or args.display):
+        player = compositor.Compositor(
+            config["sources"], group_configs, wled_streamers, fps=args.fps
+        )
+    elif config.get("playlist") and not (source != "" or args.camera or args.display):
+        player = playlist.Playlist(
+            config["playlist"],
+            wled_streamers,
+            loop=args.loop,
+            crossfade=args.crossfade,
+            fps=args.fps,
+        )
     else:
-        player = displaycapture.DisplayCapture()
+        try:
+            player = createPlayer(
+                source,
+                camera=args.camera,
+                display=args.display,
+                loop=args.loop,
+                start=args.start,
+                end=args.end,
+                fps=args.fps,
+                streamers=wled_streamers,
+            )
+        except ValueError as error:
+            parser.error(str(error))
+
+    controller = None
+    if args.adaptive and not getattr(player, "prepared", False):
+        controller = qualitycontroller.QualityController(player, wled_streamers)
 
     while True:
         try:
-            frame = player.read()
-            if frame is None:
+            if not pipeline.playFrame(player, controller):
                 break
 
-            for index, wled_streamer in enumerate(wled_streamers):
-                stream_frame = wled_streamer.cropFrame(frame)
-                stream_frame = wled_streamer.scaleFrame(stream_frame)
-                stream_frame = wled_streamer.gammaCorrectFrame(stream_frame)
-                wled_streamer.sendFrame(stream_frame)
-
-                if args.debug:
-                    cv2.imshow("wledvideo %d" % index, stream_frame)
-            if args.debug:
-                if cv2.waitKey(1) & 255 in [27, ord("q")]:
-                    break
+            if not pipeline.handleEvents():
+                break
 
         except (KeyboardInterrupt, SystemExit):
             break
 
-    if not args.display:
-        player.stop()
+    player.stop()
 
-    cv2.destroyAllWindows()
-    for wled_streamer in wled_streamers:
-        wled_streamer.close()
+    pipeline.close()
+    metrics.report(force=True)